@@ -0,0 +1,8 @@
+-- cart, payment and order lookups: WHERE email AND parentPochaID AND isPaid
+ALTER TABLE `order` ADD INDEX idx_order_email_pocha_paid (email, parentPochaID, isPaid);
+
+-- dashboard lookups: WHERE parentPochaID AND isPaid
+ALTER TABLE `order` ADD INDEX idx_order_pocha_paid (parentPochaID, isPaid);
+
+-- order items of an order, filtered by status
+ALTER TABLE orderItem ADD INDEX idx_orderitem_order_status (parentOrderID, status);
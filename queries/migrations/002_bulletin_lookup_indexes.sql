@@ -0,0 +1,9 @@
+-- board listings: WHERE type AND isAnnouncement ORDER BY postid DESC
+ALTER TABLE posts ADD INDEX idx_posts_type_announcement_postid (type, isAnnouncement, postid);
+
+-- comment trees: WHERE postid AND isCommentOfComment AND parentCommentid
+ALTER TABLE comments ADD INDEX idx_comments_post_reply_parent (postid, isCommentOfComment, parentCommentid);
+
+-- like counts and liked-or-not checks
+ALTER TABLE postlikes ADD INDEX idx_postlikes_post_email (postid, email);
+ALTER TABLE commentlikes ADD INDEX idx_commentlikes_comment_email (commentid, email);
@@ -0,0 +1,23 @@
+-- comment / like counters kept up to date by the comment and like endpoints
+ALTER TABLE posts
+    ADD COLUMN commentsCount INT NOT NULL DEFAULT 0,
+    ADD COLUMN likesCount INT NOT NULL DEFAULT 0;
+
+ALTER TABLE comments
+    ADD COLUMN likesCount INT NOT NULL DEFAULT 0;
+
+-- backfill from the existing rows
+UPDATE posts p
+    LEFT JOIN (SELECT postid, COUNT(*) AS n FROM comments GROUP BY postid) c
+        ON c.postid = p.postid
+    SET p.commentsCount = COALESCE(c.n, 0);
+
+UPDATE posts p
+    LEFT JOIN (SELECT postid, COUNT(*) AS n FROM postlikes GROUP BY postid) l
+        ON l.postid = p.postid
+    SET p.likesCount = COALESCE(l.n, 0);
+
+UPDATE comments cm
+    LEFT JOIN (SELECT commentid, COUNT(*) AS n FROM commentlikes GROUP BY commentid) l
+        ON l.commentid = cm.commentid
+    SET cm.likesCount = COALESCE(l.n, 0);
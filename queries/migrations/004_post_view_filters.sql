@@ -0,0 +1,8 @@
+-- daily Bloom filters of the viewers of each post, used to drop repeat views
+CREATE TABLE post_view_filters (
+    postid INT NOT NULL,
+    day DATE NOT NULL,
+    bits BLOB NOT NULL,
+    PRIMARY KEY (postid, day),
+    INDEX idx_post_view_filters_day (day)
+);
@@ -0,0 +1,7 @@
+-- versions behind the ETags of post and board reads
+ALTER TABLE posts ADD COLUMN version INT NOT NULL DEFAULT 0;
+
+CREATE TABLE board_versions (
+    type VARCHAR(32) PRIMARY KEY,
+    version INT NOT NULL DEFAULT 0
+);
@@ -0,0 +1,10 @@
+-- number of (non-announcement) posts per board, for pagination widgets
+CREATE TABLE board_counters (
+    type VARCHAR(32) PRIMARY KEY,
+    postCount INT NOT NULL DEFAULT 0
+);
+
+INSERT INTO board_counters (type, postCount)
+    SELECT type, COUNT(*) FROM posts
+    WHERE isAnnouncement = 0
+    GROUP BY type;
@@ -0,0 +1,7 @@
+-- visible text of the post body (HTML stripped, entities unescaped), kept by
+-- add_post / update_post; fill it for existing posts with
+-- `flask --app server index-post-texts`
+ALTER TABLE posts ADD COLUMN plainText MEDIUMTEXT;
+
+-- ngram parser: Korean has no whitespace-delimited words to index
+ALTER TABLE posts ADD FULLTEXT INDEX ft_posts_title_plaintext (title, plainText) WITH PARSER ngram;
@@ -0,0 +1,3 @@
+-- profile pages: WHERE email AND anonymous ORDER BY id DESC LIMIT n
+ALTER TABLE posts ADD INDEX idx_posts_email_anonymous_postid (email, anonymous, postid);
+ALTER TABLE comments ADD INDEX idx_comments_email_anonymous_commentid (email, anonymous, commentid);
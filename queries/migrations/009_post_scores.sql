@@ -0,0 +1,6 @@
+-- forward-decayed popularity of posts, see server/api/bulletin/popular.py
+CREATE TABLE post_scores (
+    postid INT PRIMARY KEY,
+    score DOUBLE NOT NULL,
+    INDEX idx_post_scores_score (score)
+);
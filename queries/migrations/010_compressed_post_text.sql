@@ -0,0 +1,6 @@
+-- post bodies are stored as bytes, zlib-compressed when textCodec = 1;
+-- existing rows keep their UTF-8 bytes (textCodec = 0) until
+-- `flask --app server compress-post-texts` rewrites them
+ALTER TABLE posts
+    MODIFY text MEDIUMBLOB,
+    ADD COLUMN textCodec TINYINT NOT NULL DEFAULT 0 AFTER text;
@@ -0,0 +1,9 @@
+-- images uploaded for each post, so edits and deletes need no HTML scan;
+-- existing posts are recorded on their first edit or delete, or all at once
+-- with `flask --app server backfill-post-images`
+CREATE TABLE post_images (
+    postid INT NOT NULL,
+    imageIndex INT NOT NULL,
+    imageKey VARCHAR(512) NOT NULL,
+    PRIMARY KEY (postid, imageIndex)
+);
@@ -0,0 +1,6 @@
+-- epoch the post_scores are relative to; persist moves it forward and
+-- rescales the scores before they grow too large for a double
+CREATE TABLE post_score_epoch (
+    id TINYINT PRIMARY KEY,
+    epoch DOUBLE NOT NULL
+);
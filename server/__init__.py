@@ -2,7 +2,7 @@
 
 import flask
 from flask_cors import CORS
-from flask_mysqldb import MySQL
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_socketio import SocketIO
 
 
@@ -21,7 +21,11 @@ instructions = '''
 application = flask.Flask(__name__)
 
 application.config.from_object('server.config')
-db = MySQL(application)
+
+# Behind the EB nginx (and load balancer) proxies, take the client address
+# from X-Forwarded-For, trusting only the hops we run ourselves
+application.wsgi_app = ProxyFix(application.wsgi_app,
+                                x_for=application.config['PROXY_FIX_X_FOR'])
 CORS(application, origins=[
     "https://kisa-website-client-git-dev-umich-kisas-projects.vercel.app/",
     "https://www.umichkisa.com",
@@ -42,8 +46,10 @@ sio = SocketIO(application, cors_allowed_origins=[
 application.add_url_rule('/', 'index', (lambda: header_text +
     instructions + footer_text))
 
+import server.tasks
 import server.api
 import server.model
+import server.commands
 
 
 
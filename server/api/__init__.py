@@ -7,14 +7,19 @@ from server.api.bulletin.comment import post_comment
 from server.api.bulletin.comment import update_comment
 from server.api.bulletin.comment import delete_comment
 from server.api.bulletin.comment import get_comments
+from server.api.bulletin.comment import get_replies
 from server.api.bulletin.boards import get_posts_by_board_type
 from server.api.bulletin.boards import get_announcements_by_board_type
 from server.api.bulletin.boards import get_post_count
+from server.api.bulletin.boards import get_boards_feed
 from server.api.bulletin.posts import get_post
+from server.api.bulletin.posts import get_post_bundle
 from server.api.bulletin.posts import add_post
 from server.api.bulletin.posts import update_post
 from server.api.bulletin.posts import delete_post
 from server.api.bulletin.posts import increment_readcount
+from server.api.bulletin.search import search_posts
+from server.api.bulletin.popular import get_popular_posts
 from server.api.credentials.users import get_user
 from server.api.credentials.users import put_user
 from server.api.credentials.users import delete_user
@@ -22,7 +27,9 @@ from server.api.credentials.users import get_user_posts
 from server.api.credentials.users import get_user_comments
 from server.api.bulletin.likes import post_like
 from server.api.bulletin.likes import delete_like
+from server.api.bulletin.likes import toggle_like
 from server.api.bulletin.likes import like_or_not
+from server.api.bulletin.likes import liked_batch
 
 from server.api.pocha.info import get_pocha
 from server.api.pocha.info import get_pocha_menu
@@ -44,6 +51,12 @@ from server.api.pocha.notification import register_token
 from server.api.images.presigned_url import presigned_url_for_post
 from server.api.images.presigned_url import presigned_url_for_get
 
+# DEBUG APIS ----------------------------------------------------------
+from server.api.debug.stats import get_pool_stats
+from server.api.debug.stats import get_buffer_stats
+from server.api.debug.stats import get_cache_stats
+from server.api.debug.queries import get_recent_queries
+
 # JOBS APIS -----------------------------------------------------------
 from server.api.jobs.index import get_jobs
 from server.api.jobs.third_party.wanted.index import get_job_categories
@@ -1,14 +1,18 @@
 import flask
 import server
-from ..helpers import count_comments, count_likes
+from ..helpers import encode_cursor, decode_cursor, not_modified, with_etag
+from .cache import board_cache, board_version, readcount_window
 
-# BOARDS API ------------------------------------------------------------
-# /api/v2/bulletin/boards
 @server.application.route("/api/v2/boards/<string:board_type>/posts/",
                   methods=['GET'])
 def get_posts_by_board_type(board_type):
-    cursor = server.model.Cursor()
+    """
+    Posts of a board, newest first.
 
+    Paginate with ?after=<cursor>, passing the "next" cursor of the previous
+    response; this seeks on postid, so every page costs the same.
+    ?page=<n> is still accepted for older clients.
+    """
     # Initialize flask request arguments
     size = flask.request.args.get(
         "size",
@@ -20,60 +24,135 @@ def get_posts_by_board_type(board_type):
         default=0,
         type=int
     )
+    after = flask.request.args.get(
+        "after",
+        default=None,
+        type=str
+    )
 
     # Sanity check for appropriate flask request arguments
     if (size != 10 and size != 20 and size != 30) or (page < 0):
         return flask.jsonify({'error': 'invalid pagination args'}), 400
 
-    # Fetch posts of the particular board type
-    cursor.execute(
-        "SELECT postid, type, title, fullname, readCount, isAnnouncement, created "
-        "FROM posts "
-        "WHERE type = %(type)s AND isAnnouncement = %(isAnnouncement)s "
-        "ORDER BY postid DESC "
-        "LIMIT %(limit)s",
-        {
-            'type': board_type,
-            'isAnnouncement': 0,
-            'limit': size * (page + 1)
-        }
-    )
-    posts = cursor.fetchall()
+    after_postid = None
+    if after is not None:
+        try:
+            after_postid, = decode_cursor(after, int)
+        except ValueError:
+            return flask.jsonify({'error': 'invalid pagination args'}), 400
 
-    # Return 204 NO CONTENT if no posts are in board type
-    if not posts:
-        return flask.jsonify({'response': 'No posts in board'}), 204
-    
-    # sort posts by postid
-    posts_in_page = sorted(posts[page * size : (page + 1) * size],
-                           key=lambda e : e["postid"],
-                           reverse=True)
-    
-    if not posts_in_page:
-        return flask.jsonify({'error': 'No posts in requested page'}), 404
+    # Answer conditional GETs before running the listing query
+    version = board_version(server.model.Cursor(), board_type)
+    window = readcount_window()
+    etag = f"board-{version}-{window}"
+    if flask.request.if_none_match.contains(etag):
+        return not_modified(etag)
 
-    # Count the number of comments and likes of each post
-    for post in posts_in_page:
-        count_likes(cursor, 'post', post)
-        count_comments(cursor, post)
+    # Serve from the board cache; writes to the board invalidate it
+    body, status = board_cache.get_or_compute(
+        ('posts', board_type, version, window, size, page, after_postid),
+        board_type,
+        lambda: fetch_board_page(board_type, size, page, after_postid)
+    )
+    if status != 200:
+        return flask.jsonify(body), status
 
     # render context
     context_url = flask.request.path
     if flask.request.query_string:
         context_url += f"?{flask.request.query_string.decode()}"
     context = {
-        "results": posts_in_page,
+        **body,
         "url": context_url
     }
-    return flask.jsonify(**context), 200
+    return with_etag(flask.jsonify(**context), etag), 200
+
+def fetch_board_page(board_type, size, page, after_postid):
+    """Return (body, status) of a page of board posts, without its url."""
+    cursor = server.model.Cursor()
+
+    if after_postid is not None:
+        # Seek past the last post of the previous page
+        cursor.execute(
+            "SELECT postid, type, title, fullname, readCount, isAnnouncement, created, "
+            "commentsCount, likesCount "
+            "FROM posts "
+            "WHERE type = %(type)s AND isAnnouncement = %(isAnnouncement)s "
+            "AND postid < %(after)s "
+            "ORDER BY postid DESC "
+            "LIMIT %(limit)s",
+            {
+                'type': board_type,
+                'isAnnouncement': 0,
+                'after': after_postid,
+                'limit': size + 1
+            }
+        )
+    else:
+        # Fetch posts of the particular board type
+        cursor.execute(
+            "SELECT postid, type, title, fullname, readCount, isAnnouncement, created, "
+            "commentsCount, likesCount "
+            "FROM posts "
+            "WHERE type = %(type)s AND isAnnouncement = %(isAnnouncement)s "
+            "ORDER BY postid DESC "
+            "LIMIT %(limit)s OFFSET %(offset)s",
+            {
+                'type': board_type,
+                'isAnnouncement': 0,
+                'limit': size + 1,
+                'offset': page * size
+            }
+        )
+    posts = cursor.fetchall()
+
+    # One extra row was fetched to tell whether another page follows
+    posts_in_page = list(posts[:size])
+    next_cursor = None
+    if len(posts) > size:
+        next_cursor = encode_cursor(posts_in_page[-1]["postid"])
+
+    if not posts_in_page and after_postid is None:
+        # Return 204 NO CONTENT if no posts are in board type
+        if page == 0:
+            return {'response': 'No posts in board'}, 204
+        return {'error': 'No posts in requested page'}, 404
+
+    return {"results": posts_in_page, "next": next_cursor}, 200
 
 @server.application.route("/api/v2/boards/<string:board_type>/announcements/",
                           methods=['GET'])
 def get_announcements_by_board_type(board_type):
+    # Answer conditional GETs before running the listing query
+    version = board_version(server.model.Cursor(), board_type)
+    window = readcount_window()
+    etag = f"board-{version}-{window}"
+    if flask.request.if_none_match.contains(etag):
+        return not_modified(etag)
+
+    # Serve from the board cache; writes to the board invalidate it
+    announcements = board_cache.get_or_compute(
+        ('announcements', board_type, version, window),
+        board_type,
+        lambda: fetch_announcements(board_type)
+    )
+
+    if not announcements:
+        return flask.jsonify({'response': f'No announcements for board type {board_type}'}), 204
+
+    # render context
+    context = {
+        "results": announcements,
+        "url": flask.request.path
+    }
+    return with_etag(flask.jsonify(**context), etag), 200
+
+def fetch_announcements(board_type):
     cursor = server.model.Cursor()
 
     cursor.execute(
-        "SELECT postid, type, title, fullname, readCount, isAnnouncement, created "
+        "SELECT postid, type, title, fullname, readCount, isAnnouncement, created, "
+        "commentsCount "
         "FROM posts "
         "WHERE type = %(type)s AND isAnnouncement = %(isAnnouncement)s "
         "ORDER BY postid DESC",
@@ -82,41 +161,108 @@ def get_announcements_by_board_type(board_type):
             'isAnnouncement': 1
         }
     )
-    announcements = cursor.fetchall()
+    return cursor.fetchall()
 
-    if not announcements:
-        return flask.jsonify({'response': f'No announcements for board type {board_type}'}), 204
+@server.application.route("/api/v2/boards/<string:board_type>/count/",
+                  methods=['GET'])
+def get_post_count(board_type):
+    # Answer conditional GETs before counting
+    version = board_version(server.model.Cursor(), board_type)
+    etag = f"board-{version}"
+    if flask.request.if_none_match.contains(etag):
+        return not_modified(etag)
 
-    # Count the number of comments of each post and add to response result
-    for announcement in announcements:
-        count_comments(cursor, announcement)
+    # Serve from the board cache; writes to the board invalidate it
+    post_count = board_cache.get_or_compute(
+        ('count', board_type, version),
+        board_type,
+        lambda: fetch_post_count(board_type)
+    )
     
     # render context
     context = {
-        "results": announcements,
-        "url": flask.request.path
+        'postCount': post_count
     }
-    return flask.jsonify(**context), 200
+    return with_etag(flask.jsonify(**context), etag), 200
 
-@server.application.route("/api/v2/boards/<string:board_type>/count/",
-                  methods=['GET'])
-def get_post_count(board_type):
+def fetch_post_count(board_type):
     cursor = server.model.Cursor()
 
+    # board_counters is maintained by add_post, update_post and delete_post
     cursor.execute(
-        "SELECT COUNT(*) "
-        "FROM posts "
-        "WHERE type = %(type)s AND isAnnouncement = %(isAnnouncement)s",
+        "SELECT postCount "
+        "FROM board_counters "
+        "WHERE type = %(type)s",
         {
-            'type': board_type,
-            'isAnnouncement': False
+            'type': board_type
         }
     )
-    post_count = cursor.fetchone()['COUNT(*)']
-    
+    board = cursor.fetchone()
+    return board['postCount'] if board else 0
+
+@server.application.route("/api/v2/boards/feed/", methods=['GET'])
+def get_boards_feed():
+    """
+    Latest ?per_board=<n> posts and every announcement of each board,
+    for the home page, in one query.
+    """
+    per_board = flask.request.args.get(
+        "per_board",
+        default=5,
+        type=int
+    )
+
+    # Sanity check for appropriate flask request arguments
+    if per_board < 1 or per_board > server.application.config['FEED_MAX_PER_BOARD']:
+        return flask.jsonify({'error': 'invalid per_board arg'}), 400
+
+    # Board versions only grow, so their sum changes with any board write
+    cursor = server.model.Cursor()
+    cursor.execute(
+        "SELECT COALESCE(SUM(version), 0) AS version FROM board_versions",
+        {}
+    )
+    version = cursor.fetchone()['version']
+    window = readcount_window()
+    etag = f"feed-{version}-{window}"
+    if flask.request.if_none_match.contains(etag):
+        return not_modified(etag)
+
+    feed = board_cache.get_or_compute(
+        ('feed', version, window, per_board),
+        'feed',
+        lambda: fetch_feed(per_board)
+    )
+
     # render context
     context = {
-        'postCount': post_count
+        "results": feed,
+        "url": flask.request.full_path.rstrip('?')
     }
-    return flask.jsonify(**context), 200
-    
\ No newline at end of file
+    return with_etag(flask.jsonify(**context), etag), 200
+
+def fetch_feed(per_board):
+    cursor = server.model.Cursor()
+
+    # Rank posts within each board (announcements separately), newest first
+    cursor.execute(
+        "SELECT postid, type, title, fullname, readCount, isAnnouncement, created, "
+        "commentsCount, likesCount "
+        "FROM ("
+        "SELECT postid, type, title, fullname, readCount, isAnnouncement, created, "
+        "commentsCount, likesCount, "
+        "ROW_NUMBER() OVER (PARTITION BY type, isAnnouncement ORDER BY postid DESC) AS rowNumber "
+        "FROM posts"
+        ") ranked "
+        "WHERE isAnnouncement = 1 OR rowNumber <= %(perBoard)s "
+        "ORDER BY type, postid DESC",
+        {
+            'perBoard': per_board
+        }
+    )
+
+    feed = {}
+    for post in cursor.fetchall():
+        board = feed.setdefault(post['type'], {'posts': [], 'announcements': []})
+        board['announcements' if post['isAnnouncement'] else 'posts'].append(post)
+    return feed
@@ -0,0 +1,120 @@
+import threading
+import time
+import server
+from collections import OrderedDict
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after ttl seconds.
+
+    Entries belong to a group (a board type) that writes invalidate at once.
+    Each group has a generation, bumped on invalidation, so a value computed
+    from a read that raced with a write is not stored.
+    """
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+        }
+
+    def get_or_compute(self, key, group, compute):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[2]
+            if entry is not None:
+                del self._entries[key]
+                self._stats['expirations'] += 1
+            self._stats['misses'] += 1
+            generation = self._generations.get(group, 0)
+
+        value = compute()
+
+        with self._lock:
+            # a write to the group landed while computing; value may be stale
+            if self._generations.get(group, 0) != generation:
+                return value
+            self._entries[key] = (time.monotonic() + self.ttl, group, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return value
+
+    def invalidate(self, group):
+        with self._lock:
+            self._generations[group] = self._generations.get(group, 0) + 1
+            for key in [key for key, entry in self._entries.items()
+                        if entry[1] == group]:
+                del self._entries[key]
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+            stats['maxSize'] = self.max_size
+        stats['hitRate'] = stats['hits'] / ((stats['hits'] + stats['misses']) or 1)
+        return stats
+
+board_cache = TTLCache(
+    server.application.config['BOARD_CACHE_SIZE'],
+    server.application.config['BOARD_CACHE_TTL'],
+)
+
+def board_version(cursor, board_type):
+    """
+    Version of a board, bumped by every post, comment or like written to it.
+    Read counts do not bump it; see readcount_window.
+    """
+    cursor.execute(
+        "SELECT version FROM board_versions WHERE type = %(type)s",
+        {
+            'type': board_type
+        }
+    )
+    board = cursor.fetchone()
+    return board['version'] if board else 0
+
+def readcount_window():
+    """
+    Index of the current BOARD_CACHE_TTL-long stretch of wall-clock time.
+    Listings that show read counts add it to their ETag and cache key, so
+    their read counts are at most one window stale without every buffered
+    view flush invalidating the board.
+    """
+    return int(time.time() // board_cache.ttl)
+
+def invalidate_board(cursor, board_type):
+    cursor.execute(
+        "INSERT INTO board_versions (type, version) VALUES (%(type)s, 1) "
+        "ON DUPLICATE KEY UPDATE version = version + 1",
+        {
+            'type': board_type
+        }
+    )
+
+    # after commit, so a concurrent read cannot cache the old rows again
+    server.model.after_commit(lambda: board_cache.invalidate(board_type))
+
+def invalidate_board_of_post(cursor, postid):
+    cursor.execute(
+        "SELECT type FROM posts WHERE postid = %(postid)s",
+        {
+            'postid': postid
+        }
+    )
+    post = cursor.fetchone()
+    if post:
+        invalidate_board(cursor, post['type'])
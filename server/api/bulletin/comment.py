@@ -1,6 +1,9 @@
 import flask
 import server
-from ..helpers import delete_child_comments, get_child_comments, token_required
+from ..helpers import delete_comment_subtree, fetch_comment_tree, adjust_comments_count, token_required
+from ..helpers import fetch_comment, fetch_comment_page, fetch_replies, encode_cursor, decode_cursor
+from .cache import invalidate_board_of_post
+from .popular import record_after_commit
 
 
 # COMMENTS API ------------------------------------------------------------
@@ -39,9 +42,16 @@ def post_comment(postid):
             "secret": secret,
         },
     )
+    commentid = cursor.lastrowid()
+    adjust_comments_count(cursor, postid, 1)
+    invalidate_board_of_post(cursor, postid)
+    record_after_commit(postid, 'comment')
 
-    # Return a JSON response indicating success
-    return flask.jsonify({"message": "Comment posted successfully"}), 201
+    # Return the stored comment so clients can add it without a refetch
+    return flask.jsonify({
+        "message": "Comment posted successfully",
+        "comment": fetch_comment(cursor, commentid),
+    }), 201
 
 
 @server.application.route("/api/v2/comments/<int:commentid>/", methods=["PUT"])
@@ -64,14 +74,12 @@ def update_comment(commentid):
         {"text": data["text"], "commentid": commentid},
     )
 
-    # Update the comment with the new data (replace this with your actual update logic)
-    updated_comment_data = {
-        "commentid": commentid,
-        "text": data["text"],
-    }
+    # Return the stored comment so clients can replace it without a refetch
+    updated_comment = fetch_comment(cursor, commentid)
+    if not updated_comment:
+        return flask.jsonify({"error": "Comment not found"}), 404
 
-    # Return a JSON response indicating success
-    return flask.jsonify(updated_comment_data)
+    return flask.jsonify(updated_comment)
 
 
 @server.application.route("/api/v2/comments/<int:commentid>/", methods=["DELETE"])
@@ -90,7 +98,9 @@ def delete_comment(commentid):
         return flask.jsonify({"error": "Comment not found"}), 404
     else:
         # Delete the comment from the database
-        delete_child_comments(existing_comment, cursor)
+        deleted = delete_comment_subtree(cursor, existing_comment)
+        adjust_comments_count(cursor, existing_comment["postid"], -deleted)
+        invalidate_board_of_post(cursor, existing_comment["postid"])
 
         # Return a success message
         return flask.jsonify(
@@ -100,37 +110,93 @@ def delete_comment(commentid):
 
 @server.application.route("/api/v2/comments/<int:postid>/", methods=["GET"])
 def get_comments(postid):
-    cursor = server.model.Cursor()
+    """
+    Comments of a post, oldest first.
+
+    Without ?size=<n> the whole tree is returned. With it, only a page of
+    depth-1 comments is, each with repliesCount and its first replies;
+    pass the "next" cursor as ?after=<cursor> for the following page and
+    load the remaining replies from /api/v2/comments/<commentid>/replies/.
+    Every comment has repliesCount and childComments in both modes.
+    """
+    # Initialize flask request arguments
+    size = flask.request.args.get("size", default=None, type=int)
+    after = flask.request.args.get("after", default=None, type=str)
 
-    # Fetch comments of depth 1 as list (not comment of comment)
-    cursor.execute(
-        "SELECT * FROM comments WHERE postid = %(postid)s "
-        "AND isCommentOfComment = %(isCommentOfComment)s",
-        {"postid": postid, "isCommentOfComment": False},
+    cursor = server.model.Cursor()
+    if size is None:
+        # Fetch every comment of the post and nest replies under their parents
+        comments = fetch_comment_tree(cursor, postid)
+
+        return flask.jsonify(comments)
+
+    # Sanity check for appropriate flask request arguments
+    if size < 1 or size > 100:
+        return flask.jsonify({"error": "invalid pagination args"}), 400
+
+    after_commentid = None
+    if after is not None:
+        try:
+            after_commentid, = decode_cursor(after, int)
+        except ValueError:
+            return flask.jsonify({"error": "invalid pagination args"}), 400
+
+    comments, next_commentid = fetch_comment_page(
+        cursor, postid, size, after_commentid,
+        server.application.config["COMMENT_REPLIES_PREVIEW"]
     )
-    comments = cursor.fetchall()
 
-    # Return empty list if there is no comments
-    if not comments:
-        return flask.jsonify([])
+    next_cursor = encode_cursor(next_commentid) if next_commentid is not None else None
+    return flask.jsonify({"results": comments, "next": next_cursor}), 200
+
+
+@server.application.route("/api/v2/comments/<int:commentid>/replies/", methods=["GET"])
+def get_replies(commentid):
+    """
+    Direct replies to a comment, oldest first, ?size=<n> at a time.
+    Pass the "next" cursor of the previous response as ?after=<cursor>.
+    """
+    # Initialize flask request arguments
+    size = flask.request.args.get("size", default=20, type=int)
+    after = flask.request.args.get("after", default=None, type=str)
+
+    # Sanity check for appropriate flask request arguments
+    if size < 1 or size > 100:
+        return flask.jsonify({"error": "invalid pagination args"}), 400
 
-    # Convert SQL row object to a dictionary for JSON serialization
-    comments = [dict(comment) for comment in comments]
+    after_commentid = None
+    if after is not None:
+        try:
+            after_commentid, = decode_cursor(after, int)
+        except ValueError:
+            return flask.jsonify({"error": "invalid pagination args"}), 400
 
-    # Iterate through post comments
-    for comment_depth1 in comments:
-        get_child_comments(comment_depth1, cursor)
+    # The post of the parent lets the replies query seek on the comments index
+    cursor = server.model.Cursor()
+    cursor.execute(
+        "SELECT postid FROM comments WHERE commentid = %(commentid)s",
+        {"commentid": commentid},
+    )
+    parent = cursor.fetchone()
+    if not parent:
+        return flask.jsonify({"error": "Comment not found"}), 404
+
+    replies, next_commentid = fetch_replies(
+        cursor, parent["postid"], commentid, size, after_commentid
+    )
 
-    return flask.jsonify(comments)
+    next_cursor = encode_cursor(next_commentid) if next_commentid is not None else None
+    return flask.jsonify({"results": replies, "next": next_cursor}), 200
 
 @server.application.route("/api/v2/comments/likes/<int:commentid>/", methods=['GET'])
 def count_commentlike(commentid):
     cursor = server.model.Cursor()
     cursor.execute(
-        "SELECT COUNT(*) FROM commentlikes WHERE commentid = %(commentid)s",
+        "SELECT likesCount FROM comments WHERE commentid = %(commentid)s",
         {
             'commentid': commentid
         }
     )
-    likes_count = cursor.fetchone()['COUNT(*)']
+    comment = cursor.fetchone()
+    likes_count = comment['likesCount'] if comment else 0
     return flask.jsonify({'likesCount': likes_count}), 200
\ No newline at end of file
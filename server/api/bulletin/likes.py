@@ -1,6 +1,8 @@
 import flask
 import server
-from ..helpers import token_required
+from ..helpers import token_required, adjust_likes_count, fetch_liked
+from .cache import invalidate_board_of_post
+from .popular import record_after_commit
 
 # Likes API ------------------------------------------------------------
 # /api/v2/bulletin/likes
@@ -20,17 +22,9 @@ def post_like(id):
     if not email or not target or target not in ['post', 'comment']:
         return flask.jsonify({"error": "Missing required request body key"}), 400
 
-    # Query database to insert like
+    # Query database to insert like; liking twice is a no-op
     cursor = server.model.Cursor()
-    cursor.execute(
-        f'''
-        INSERT INTO {target}likes (email, {target}id) VALUES (%(email)s, %(id)s)
-        ''',
-        {
-            'email': email,
-            'id': id
-        }
-    )
+    set_like(cursor, target, id, email, True)
 
     # Return success message
     return flask.jsonify({"message": f"{target} liked successfully"}), 201
@@ -50,21 +44,54 @@ def delete_like(id):
     if not email or not target or target not in ['post', 'comment']:
         return flask.jsonify({"error": "Missing required request body key"}), 400
 
-    # Query database to insert like
+    # Query database to delete like
     cursor = server.model.Cursor()
+    set_like(cursor, target, id, email, False)
+
+    # Return success message
+    return flask.jsonify({"message": f"{target} unliked successfully"}), 204
+
+@server.application.route("/api/v2/likes/<int:id>/", methods=['PUT'])
+@token_required
+def toggle_like(id):
+    '''
+    Like or unlike a post or comment and return the new like count.
+    Email and target specified in body; liked (true / false) sets the
+    state explicitly, otherwise the current state is flipped.
+    '''
+    # Fetch email, target and liked from the request body
+    body = flask.request.get_json()
+    email = body.get('email')
+    target = body.get('target') # 'post' or 'comment'
+    liked = body.get('liked')
+
+    # Handle bad request
+    if not email or not target or target not in ['post', 'comment']:
+        return flask.jsonify({"error": "Missing required request body key"}), 400
+    if liked is not None and not isinstance(liked, bool):
+        return flask.jsonify({"error": "liked must be true or false"}), 400
+
+    cursor = server.model.Cursor()
+    if liked is None:
+        # Flip: unlike if a like was there, like otherwise
+        liked = not set_like(cursor, target, id, email, False)
+        if liked:
+            set_like(cursor, target, id, email, True)
+    else:
+        set_like(cursor, target, id, email, liked)
+
+    # Fresh count from the same transaction
     cursor.execute(
-        f'''
-        DELETE FROM {target}likes
-        WHERE email = %(email)s AND {target}id = %(id)s
-        ''',
+        f"SELECT likesCount FROM {target}s WHERE {target}id = %(id)s",
         {
-            'email': email,
             'id': id
         }
     )
+    row = cursor.fetchone()
+    if not row:
+        return flask.jsonify({"error": f"{target} {id} not found"}), 404
 
-    # Return success message
-    return flask.jsonify({"message": f"{target} unliked successfully"}), 204
+    return flask.jsonify({"liked": liked, "likesCount": row['likesCount']}), 200
 
 @server.application.route("/api/v2/likes/<int:id>/", methods=['GET'])
 @token_required
@@ -97,4 +124,77 @@ def like_or_not(id):
     if not like:
         return flask.jsonify({"liked": False}), 200
     else:
-        return flask.jsonify({"liked": True}), 200
\ No newline at end of file
+        return flask.jsonify({"liked": True}), 200
+
+def set_like(cursor, target, id, email, liked):
+    """
+    Make email like (or not like) the post / comment; returns whether
+    anything changed. Counters move only when a row was really added or
+    removed, so repeating the same request is harmless.
+    """
+    if liked:
+        cursor.execute(
+            f'''
+            INSERT IGNORE INTO {target}likes (email, {target}id) VALUES (%(email)s, %(id)s)
+            ''',
+            {
+                'email': email,
+                'id': id
+            }
+        )
+    else:
+        cursor.execute(
+            f'''
+            DELETE FROM {target}likes
+            WHERE email = %(email)s AND {target}id = %(id)s
+            ''',
+            {
+                'email': email,
+                'id': id
+            }
+        )
+    changed = cursor.rowcount()
+    if not changed:
+        return False
+
+    adjust_likes_count(cursor, target, id, changed if liked else -changed)
+
+    # Board listings show the like count of posts
+    if target == 'post':
+        invalidate_board_of_post(cursor, id)
+        record_after_commit(id, 'like', changed if liked else -changed)
+    return True
+
+@server.application.route("/api/v2/likes/", methods=['GET'])
+@token_required
+def liked_batch():
+    '''
+    Returns which of the listed posts / comments the user liked.
+    Ids are comma separated: ?email=<email>&posts=1,2&comments=3,4
+    '''
+    # Fetch email and ids from the url arguments
+    email = flask.request.args.get("email", type=str)
+    try:
+        postids = parse_ids(flask.request.args.get("posts", default="", type=str))
+        commentids = parse_ids(flask.request.args.get("comments", default="", type=str))
+    except ValueError:
+        return flask.jsonify({"error": "ids must be comma separated integers"}), 400
+
+    # Handle bad request
+    if not email:
+        return flask.jsonify({"error": "Missing required request body key"}), 400
+    if len(postids) + len(commentids) > server.application.config['LIKES_BATCH_MAX']:
+        return flask.jsonify({"error": "Too many ids"}), 400
+
+    # Query database once for both targets
+    cursor = server.model.Cursor()
+    liked = fetch_liked(cursor, email, postids, commentids)
+
+    return flask.jsonify({
+        "posts": sorted(liked['posts']),
+        "comments": sorted(liked['comments'])
+    }), 200
+
+def parse_ids(ids):
+    # "1,2,,3" -> [1, 2, 3], without duplicates
+    return list(dict.fromkeys(int(id) for id in ids.split(',') if id.strip()))
@@ -0,0 +1,279 @@
+import bisect
+import threading
+import time
+import flask
+import server
+import server.tasks
+from collections import defaultdict
+from ..helpers import in_clause
+
+class PopularPosts:
+    """
+    Leaderboard of posts by likes, comments and views with time decay.
+
+    Scores use forward decay: an event at time t adds weight * 2^((t - epoch)
+    / half_life), so older events never need to be rescored, and dividing
+    by the same factor for now gives the decayed score. Deltas are kept in
+    memory and added to post_scores every POPULAR_PERSIST_INTERVAL seconds,
+    after which the top entries are reloaded, so every process converges on
+    the same ranking.
+
+    The epoch of the stored scores is kept in post_score_epoch. Once it is
+    older than rebase_after, persist moves it to now and divides the stored
+    scores by their growth, so they never overflow a double.
+    """
+    def __init__(self, weights, half_life, epoch, rebase_after, size):
+        self.weights = weights
+        self.half_life = half_life
+        # epoch of post_scores until post_score_epoch has one
+        self.first_epoch = epoch
+        # epoch of _scores and _pending; follows the stored epoch on load
+        self.epoch = epoch
+        self.rebase_after = rebase_after
+        self.size = size
+        self._pending = defaultdict(float)
+        self._scores = {}
+        # (-score, postid), best first
+        self._ranking = []
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._stats = {
+            'events': 0,
+            'persisted': 0,
+            'persists': 0,
+            'rebases': 0,
+            'failures': 0,
+        }
+
+    def _growth(self, now=None, epoch=None):
+        now = time.time() if now is None else now
+        epoch = self.epoch if epoch is None else epoch
+        return 2 ** ((now - epoch) / self.half_life)
+
+    def _move_epoch(self, epoch):
+        # caller holds the lock; keeps every decayed score as it is
+        scale = self._growth(self.epoch, epoch)
+        for postid in self._pending:
+            self._pending[postid] *= scale
+        self._scores = {postid: score * scale for postid, score in self._scores.items()}
+        self._ranking = [(score * scale, postid) for score, postid in self._ranking]
+        self.epoch = epoch
+
+    def _current_growth(self):
+        # caller holds the lock; a process that has not persisted for a
+        # while moves its own epoch, persist converts to the stored one
+        now = time.time()
+        if now - self.epoch >= self.rebase_after:
+            self._move_epoch(now)
+        return self._growth(now)
+
+    def _set_score(self, postid, score):
+        # caller holds the lock
+        old = self._scores.get(postid)
+        if old is not None:
+            del self._ranking[bisect.bisect_left(self._ranking, (-old, postid))]
+        self._scores[postid] = score
+        bisect.insort(self._ranking, (-score, postid))
+
+    def record(self, postid, event, count=1):
+        """Add count events ('like', 'comment' or 'view') of postid; negative undoes."""
+        with self._lock:
+            delta = self.weights[event] * count * self._current_growth()
+            self._pending[postid] += delta
+            self._set_score(postid, self._scores.get(postid, 0.0) + delta)
+            self._stats['events'] += 1
+
+    def record_many(self, counts, event):
+        """Add counts[postid] events of every postid in counts."""
+        with self._lock:
+            growth = self._current_growth()
+            for postid, count in counts.items():
+                delta = self.weights[event] * count * growth
+                self._pending[postid] += delta
+                self._set_score(postid, self._scores.get(postid, 0.0) + delta)
+            self._stats['events'] += len(counts)
+
+    def top(self, cursor, k):
+        """[(postid, decayed score)] of the k best posts."""
+        if not self._loaded:
+            self.load(cursor)
+        with self._lock:
+            growth = self._current_growth()
+            return [(postid, -score / growth) for score, postid in self._ranking[:k]]
+
+    def stored_epoch(self, cursor, for_update=False):
+        """Epoch of post_scores; the configured epoch until one is stored."""
+        if for_update:
+            cursor.execute(
+                "INSERT IGNORE INTO post_score_epoch (id, epoch) VALUES (1, %(epoch)s)",
+                {
+                    'epoch': self.first_epoch
+                }
+            )
+        cursor.execute(
+            "SELECT epoch FROM post_score_epoch WHERE id = 1"
+            + (" FOR UPDATE" if for_update else ""),
+            {}
+        )
+        row = cursor.fetchone()
+        return row['epoch'] if row else self.first_epoch
+
+    def load(self, cursor, epoch=None):
+        if epoch is None:
+            epoch = self.stored_epoch(cursor)
+        cursor.execute(
+            "SELECT postid, score FROM post_scores ORDER BY score DESC LIMIT %(limit)s",
+            {
+                'limit': self.size
+            }
+        )
+        stored = cursor.fetchall()
+        with self._lock:
+            # follow a newer stored epoch; stored scores of an older one are
+            # scaled down to ours, which cannot overflow
+            if epoch > self.epoch:
+                self._move_epoch(epoch)
+            scale = self._growth(epoch, self.epoch)
+
+            # deltas recorded since the last persist are not stored yet
+            self._scores = {}
+            self._ranking = []
+            for row in stored:
+                self._set_score(row['postid'],
+                                row['score'] * scale + self._pending.get(row['postid'], 0.0))
+            for postid, delta in self._pending.items():
+                if postid not in self._scores:
+                    self._set_score(postid, delta)
+            self._loaded = True
+
+    def persist(self):
+        with self._lock:
+            deltas, self._pending = self._pending, defaultdict(float)
+            deltas_epoch = self.epoch
+
+        try:
+            with server.model.transaction():
+                cursor = server.model.Cursor()
+                # every process persists against the same, locked epoch
+                epoch = self.stored_epoch(cursor, for_update=True)
+                now = time.time()
+                rebased = now - epoch >= self.rebase_after
+                if rebased:
+                    # multiply by the inverse: it underflows to 0 where the
+                    # growth itself would overflow
+                    cursor.execute(
+                        "UPDATE post_scores SET score = score * %(scale)s",
+                        {
+                            'scale': self._growth(epoch, now)
+                        }
+                    )
+                    cursor.execute(
+                        "UPDATE post_score_epoch SET epoch = %(epoch)s WHERE id = 1",
+                        {
+                            'epoch': now
+                        }
+                    )
+                    epoch = now
+
+                if deltas:
+                    # deltas were scored against the epoch of this process
+                    scale = self._growth(deltas_epoch, epoch)
+                    placeholders, args = in_clause(deltas.keys())
+                    values = ', '.join(f"(%({key})s, %(d{key})s)" for key in args)
+                    args.update({f"d{key}": deltas[postid] * scale for key, postid in list(args.items())})
+                    cursor.execute(
+                        "INSERT INTO post_scores (postid, score) "
+                        f"VALUES {values} "
+                        "ON DUPLICATE KEY UPDATE score = score + VALUES(score)",
+                        args
+                    )
+
+                # forget posts whose decayed score dropped to nothing, and deleted posts
+                cursor.execute(
+                    "DELETE FROM post_scores WHERE score < %(floor)s",
+                    {
+                        'floor': self.weights['view'] * self._growth(now, epoch) / 100
+                    }
+                )
+                cursor.execute(
+                    "DELETE s FROM post_scores s "
+                    "LEFT JOIN posts p ON p.postid = s.postid "
+                    "WHERE p.postid IS NULL",
+                    {}
+                )
+                self.load(cursor, epoch)
+        except Exception:
+            # keep the deltas for the next persist instead of losing them
+            with self._lock:
+                scale = self._growth(deltas_epoch, self.epoch)
+                for postid, delta in deltas.items():
+                    self._pending[postid] += delta * scale
+                self._stats['failures'] += 1
+            raise
+
+        with self._lock:
+            self._stats['persisted'] += len(deltas)
+            self._stats['persists'] += 1
+            self._stats['rebases'] += rebased
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['rankedPosts'] = len(self._ranking)
+            stats['pendingPosts'] = len(self._pending)
+            stats['epoch'] = self.epoch
+        return stats
+
+popular_posts = PopularPosts(
+    server.application.config['POPULAR_WEIGHTS'],
+    server.application.config['POPULAR_HALF_LIFE'],
+    server.application.config['POPULAR_EPOCH'],
+    server.application.config['POPULAR_REBASE_AFTER'],
+    server.application.config['POPULAR_SIZE'],
+)
+
+@server.tasks.periodic(server.application.config['POPULAR_PERSIST_INTERVAL'])
+def persist_popular_posts():
+    popular_posts.persist()
+
+def record_after_commit(postid, event, count=1):
+    # only count likes and comments that were really stored
+    server.model.after_commit(lambda: popular_posts.record(postid, event, count))
+
+# POPULAR POSTS API ------------------------------------------------------
+# /api/v2/bulletin/popular
+@server.application.route("/api/v2/posts/popular/", methods=['GET'])
+def get_popular_posts():
+    """
+    The ?size=<n> most popular posts of the last days, best first.
+    Likes, comments and views count for less the older they are.
+    """
+    size = flask.request.args.get("size", default=10, type=int)
+
+    # Sanity check for appropriate flask request arguments
+    if size < 1 or size > 50:
+        return flask.jsonify({'error': 'invalid size arg'}), 400
+
+    cursor = server.model.Cursor()
+    ranking = popular_posts.top(cursor, size)
+    if not ranking:
+        return flask.jsonify({'results': []}), 200
+
+    placeholders, args = in_clause([postid for postid, _ in ranking])
+    cursor.execute(
+        "SELECT postid, type, title, fullname, readCount, isAnnouncement, created, "
+        "commentsCount, likesCount "
+        "FROM posts "
+        f"WHERE postid IN ({placeholders})",
+        args
+    )
+    posts = {post['postid']: post for post in cursor.fetchall()}
+
+    # keep the ranking order; posts deleted since the last persist are skipped
+    results = []
+    for postid, score in ranking:
+        if postid in posts:
+            posts[postid]['score'] = round(score, 3)
+            results.append(posts[postid])
+
+    return flask.jsonify({'results': results}), 200
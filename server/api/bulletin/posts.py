@@ -1,7 +1,10 @@
 import flask
 import server
-from ..helpers import token_required, count_comments, count_likes
+from ..helpers import token_required, not_modified, with_etag, adjust_post_count, html_to_text, viewer_key
+from ..helpers import fetch_comment_tree, fetch_liked, fetch_post, encode_post_text
 from ..images.image_handler import upload_imgs, update_imgs, delete_imgs
+from .readcount import read_counts, unique_views
+from .cache import invalidate_board, readcount_window
 
 # POSTS API ------------------------------------------------------------
 # /api/v2/bulletin/posts
@@ -10,28 +13,78 @@ from ..images.image_handler import upload_imgs, update_imgs, delete_imgs
 def get_post(postid):
     cursor = server.model.Cursor()
 
-    # Fetch the post based on postid
+    # Answer conditional GETs before fetching the body
     cursor.execute(
-        "SELECT * "
-        "FROM posts "
-        "WHERE postid = %(postid)s",
+        "SELECT version FROM posts WHERE postid = %(postid)s",
         {
             'postid': postid
         }
     )
-    post = cursor.fetchone()
+    post_version = cursor.fetchone()
+    if not post_version:
+        return flask.jsonify({'error': 'No Post Found'}), 404
+
+    # readCount changes with every flush; like the boards, it may lag one window
+    etag = f"post-{postid}-{post_version['version']}-{readcount_window()}"
+    if flask.request.if_none_match.contains(etag):
+        return not_modified(etag)
+
+    # Fetch the post based on postid
+    post = fetch_post(cursor, postid)
 
     # return 404 NOT FOUND if no posts are in board type
     if not post:
         return flask.jsonify({'error': 'No Post Found'}), 404
-    
-    # Count the number of comments and likes of the post
-    count_comments(cursor, post)
-    count_likes(cursor, "post", post)
 
     # render context
     context = post
-    return flask.jsonify(**context)
+    return with_etag(flask.jsonify(**context), etag)
+
+@server.application.route("/api/v2/posts/<int:postid>/bundle/",
+                  methods=['GET'])
+def get_post_bundle(postid):
+    """
+    Everything the post page needs in one request: the post, its comment
+    tree, its like count, whether ?email=<email> liked the post and each
+    comment, and the view itself is recorded.
+    """
+    email = flask.request.args.get("email", type=str)
+
+    # every statement below runs in the one unit of work of this request
+    cursor = server.model.Cursor()
+    post = fetch_post(cursor, postid)
+    if not post:
+        return flask.jsonify({'error': 'No Post Found'}), 404
+
+    # Record the view the same way increment_readcount does
+    viewer = viewer_key()
+    if unique_views.add(cursor, postid, viewer):
+        post['readCount'] += read_counts.add(postid)
+    else:
+        post['readCount'] += read_counts.pending(postid)
+
+    comments = fetch_comment_tree(cursor, postid)
+
+    # Liked state of the post and every comment at any depth, from one query
+    all_comments = []
+    stack = list(comments)
+    while stack:
+        comment = stack.pop()
+        all_comments.append(comment)
+        stack.extend(comment['childComments'])
+    liked = fetch_liked(cursor, email, [postid],
+                        [comment['commentid'] for comment in all_comments])
+    for comment in all_comments:
+        comment['liked'] = comment['commentid'] in liked['comments']
+
+    # render context
+    context = {
+        'post': post,
+        'comments': comments,
+        'likesCount': post['likesCount'],
+        'liked': postid in liked['posts']
+    }
+    return flask.jsonify(**context), 200
 
 @server.application.route("/api/v2/posts/", methods=['POST'])
 @token_required
@@ -62,14 +115,22 @@ def add_post():
     # Handle image upload
     new_text = upload_imgs(body['text'], postid)
 
-    # Update the post with the text
+    # Update the post with the text, compressed at rest
+    stored_text, text_codec = encode_post_text(new_text)
     cursor.execute(
-        "UPDATE posts SET text = %(text)s WHERE postid = %(postid)s",
+        "UPDATE posts SET text = %(text)s, textCodec = %(textCodec)s, "
+        "plainText = %(plainText)s "
+        "WHERE postid = %(postid)s",
         {
-            'text': new_text,
+            'text': stored_text,
+            'textCodec': text_codec,
+            'plainText': html_to_text(new_text),
             'postid': postid
         }
     )
+    if not body['isAnnouncement']:
+        adjust_post_count(cursor, body['type'], 1)
+    invalidate_board(cursor, body['type'])
 
     return flask.jsonify({'message': 'post created successfully'}), 201
 
@@ -81,37 +142,44 @@ def update_post(postid):
     # Fetch body from request
     body = flask.request.get_json()
 
-    # Fetch previous text by postid
+    # Fetch the previous post by postid
     cursor = server.model.Cursor()
     cursor.execute(
-        "SELECT text FROM posts WHERE postid = %(postid)s",
+        "SELECT type, isAnnouncement FROM posts WHERE postid = %(postid)s",
         {
             'postid': postid
         }
     )
-  
-    prev_text = cursor.fetchone()['text']
+    prev_post = cursor.fetchone()
 
-    if not prev_text:
+    if not prev_post:
         return flask.jsonify({'error': f'Post {postid} not found'}), 404
 
     # Handle image upload
-    #   Compare the new text with the previous text
+    #   Compare the images in the new text with the post's image manifest
     #   Deletes / uploads images accordingly
-    #   Text includes raw image pixel values
-    new_text = update_imgs(body['text'], prev_text, postid)
+    new_text = update_imgs(body['text'], postid)
 
+    stored_text, text_codec = encode_post_text(new_text)
     cursor.execute(
         "UPDATE posts SET "
-        "title = %(title)s, text = %(text)s, isAnnouncement = %(isAnnouncement)s "
+        "title = %(title)s, text = %(text)s, textCodec = %(textCodec)s, "
+        "plainText = %(plainText)s, "
+        "isAnnouncement = %(isAnnouncement)s, version = version + 1 "
         "WHERE postid = %(postid)s",
         {
             'title': body['title'],
-            'text': new_text,
+            'text': stored_text,
+            'textCodec': text_codec,
+            'plainText': html_to_text(new_text),
             'isAnnouncement': body['isAnnouncement'],
             'postid': postid,
         }
     )
+    # Announcements are not counted as posts of the board
+    if bool(prev_post['isAnnouncement']) != bool(body['isAnnouncement']):
+        adjust_post_count(cursor, prev_post['type'], -1 if body['isAnnouncement'] else 1)
+    invalidate_board(cursor, prev_post['type'])
 
     return flask.jsonify({'message': f'post {postid} updated successfully'}), 200
 
@@ -122,7 +190,7 @@ def delete_post(postid):
 
     # Check if the post with the specified postid exists
     cursor.execute(
-        'SELECT * FROM posts WHERE postid = %(postid)s',
+        'SELECT type, isAnnouncement FROM posts WHERE postid = %(postid)s',
         {
             'postid': postid
         }
@@ -131,7 +199,7 @@ def delete_post(postid):
 
     if existing_post:
         # Delete imgs
-        delete_imgs(existing_post['text'])
+        delete_imgs(postid)
 
         # Delete the post from the database
         cursor.execute(
@@ -140,6 +208,9 @@ def delete_post(postid):
                 'postid': postid
             }
         )
+        if not existing_post['isAnnouncement']:
+            adjust_post_count(cursor, existing_post['type'], -1)
+        invalidate_board(cursor, existing_post['type'])
 
         # Return a success message
         return flask.jsonify({'message': f'Post {postid} deleted successfully'}), 204
@@ -152,7 +223,7 @@ def increment_readcount(postid):
     cursor = server.model.Cursor()
     # Check if the post with the specified postid exists
     cursor.execute(
-        'SELECT * FROM posts WHERE postid = %(postid)s',
+        'SELECT readCount FROM posts WHERE postid = %(postid)s',
         {
             'postid': postid
         }
@@ -160,22 +231,18 @@ def increment_readcount(postid):
     existing_post = cursor.fetchone()
 
     if existing_post:
-        # get current readCount
-        cur_readCount = existing_post['readCount']
+        # Identify the reader by email, or by address and client when logged out
+        viewer = viewer_key()
 
-        # Update readCount of existing post
-        cursor.execute(
-            "UPDATE posts "
-            "SET readCount = %(readCount)s "
-            "WHERE postid = %(postid)s ",
-            {
-                'readCount': cur_readCount + 1,
-                'postid': postid
-            }
-        )
+        # Repeat views of the same reader today are not counted again
+        if unique_views.add(cursor, postid, viewer):
+            # Buffer the view; it is written to the database with the next flush
+            read_count = existing_post['readCount'] + read_counts.add(postid)
+        else:
+            read_count = existing_post['readCount'] + read_counts.pending(postid)
 
         # Return a success message
-        return flask.jsonify({'message': f'Post {postid} readCount is now {cur_readCount + 1}'}), 200
+        return flask.jsonify({'message': f'Post {postid} readCount is now {read_count}'}), 200
     else:
         # Return an error message if the post doesn't exist
         return flask.jsonify({'error': 'Post not found'}), 404
@@ -184,10 +251,11 @@ def increment_readcount(postid):
 def count_postlike(postid):
     cursor = server.model.Cursor()
     cursor.execute(
-        "SELECT COUNT(*) FROM postlikes WHERE postid = %(postid)s",
+        "SELECT likesCount FROM posts WHERE postid = %(postid)s",
         {
             'postid': postid
         }
     )
-    likes_count = cursor.fetchone()['COUNT(*)']
+    post = cursor.fetchone()
+    likes_count = post['likesCount'] if post else 0
     return flask.jsonify({'likesCount': likes_count}), 200
\ No newline at end of file
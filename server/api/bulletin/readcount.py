@@ -0,0 +1,248 @@
+import datetime
+import hashlib
+import threading
+import server
+import server.tasks
+from collections import defaultdict
+from ..helpers import in_clause
+from .popular import popular_posts
+
+class ReadCountBuffer:
+    """
+    Accumulates post views in memory and writes them out in batches.
+
+    Each flush turns every buffered post into one branch of a single
+    UPDATE ... CASE, so a hot post costs one row update per flush instead
+    of one per view. Views are at most READCOUNT_FLUSH_INTERVAL seconds stale.
+    """
+    def __init__(self, max_pending):
+        self.max_pending = max_pending
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._stats = {
+            'buffered': 0,
+            'flushed': 0,
+            'flushes': 0,
+            'failures': 0,
+            'lastFlushPosts': 0,
+        }
+
+    def add(self, postid):
+        """Buffer one view; returns the views of postid not yet flushed."""
+        with self._lock:
+            self._pending[postid] += 1
+            self._stats['buffered'] += 1
+            pending = self._pending[postid]
+            full = len(self._pending) >= self.max_pending
+        if full:
+            # flush early to bound memory, from the task thread so this
+            # request does not wait for a second pooled connection
+            server.tasks.trigger(flush_read_counts)
+        return pending
+
+    def pending(self, postid):
+        with self._lock:
+            return self._pending.get(postid, 0)
+
+    def flush(self):
+        with self._lock:
+            increments, self._pending = self._pending, defaultdict(int)
+        if not increments:
+            return
+
+        postids, args = in_clause(increments.keys())
+        cases = ' '.join(
+            f"WHEN %({key})s THEN %(n{key})s" for key in args
+        )
+        args.update({f"n{key}": increments[postid] for key, postid in list(args.items())})
+
+        try:
+            with server.model.transaction():
+                cursor = server.model.Cursor()
+                # boards are not invalidated: listings refresh read counts
+                # once per readcount_window instead
+                cursor.execute(
+                    "UPDATE posts "
+                    f"SET readCount = readCount + CASE postid {cases} ELSE 0 END "
+                    f"WHERE postid IN ({postids})",
+                    args
+                )
+        except Exception:
+            # keep the views for the next flush instead of losing them
+            with self._lock:
+                for postid, count in increments.items():
+                    self._pending[postid] += count
+                self._stats['failures'] += 1
+            raise
+
+        popular_posts.record_many(increments, 'view')
+
+        with self._lock:
+            self._stats['flushed'] += sum(increments.values())
+            self._stats['flushes'] += 1
+            self._stats['lastFlushPosts'] = len(increments)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pendingPosts'] = len(self._pending)
+            stats['pendingViews'] = sum(self._pending.values())
+        return stats
+
+class BloomFilter:
+    """Fixed-size set of strings with false positives but no false negatives."""
+    def __init__(self, size, hashes, bits=None):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bytearray(bits) if bits else bytearray(size // 8)
+
+    def _positions(self, item):
+        # double hashing: k positions out of one 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        """Add item; returns False if it was (probably) already present."""
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        return added
+
+    def merge(self, bits):
+        for i, byte in enumerate(bits[:len(self.bits)]):
+            self.bits[i] |= byte
+
+class UniqueViews:
+    """
+    Per-post, per-day Bloom filters of who viewed a post, so a reader
+    refreshing the page only counts once a day.
+
+    Filters live in memory and are snapshotted to post_view_filters, where
+    the filters of every server process are OR-ed together.
+    """
+    def __init__(self, size, hashes, retention_days):
+        self.size = size
+        self.hashes = hashes
+        self.retention_days = retention_days
+        self._filters = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._stats = {
+            'views': 0,
+            'repeats': 0,
+            'snapshots': 0,
+        }
+
+    def add(self, cursor, postid, viewer):
+        """Record a view; returns False if viewer already viewed postid today."""
+        key = (postid, datetime.date.today())
+        with self._lock:
+            view_filter = self._filters.get(key)
+
+        # first view of the post today in this process: start from the snapshot
+        if view_filter is None:
+            cursor.execute(
+                "SELECT bits FROM post_view_filters "
+                "WHERE postid = %(postid)s AND day = %(day)s",
+                {
+                    'postid': key[0],
+                    'day': key[1]
+                }
+            )
+            snapshot = cursor.fetchone()
+            view_filter = BloomFilter(self.size, self.hashes,
+                                      snapshot['bits'] if snapshot else None)
+            with self._lock:
+                view_filter = self._filters.setdefault(key, view_filter)
+
+        with self._lock:
+            added = view_filter.add(viewer)
+            self._stats['views'] += 1
+            if added:
+                self._dirty.add(key)
+            else:
+                self._stats['repeats'] += 1
+        return added
+
+    def snapshot(self):
+        today = datetime.date.today()
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            filters = {key: self._filters[key] for key in dirty}
+            # filters of past days are never read again once written
+            for key in [key for key in self._filters if key[1] < today]:
+                if key not in dirty:
+                    del self._filters[key]
+
+        with server.model.transaction():
+            cursor = server.model.Cursor()
+            if filters:
+                keys = list(filters)
+                args = {}
+                for i, (postid, day) in enumerate(keys):
+                    args[f'postid{i}'] = postid
+                    args[f'day{i}'] = day
+                rows = ', '.join(f"(%(postid{i})s, %(day{i})s)" for i in range(len(keys)))
+
+                # lock the stored filters so concurrent snapshots merge, not overwrite
+                cursor.execute(
+                    "SELECT postid, day, bits FROM post_view_filters "
+                    f"WHERE (postid, day) IN ({rows}) FOR UPDATE",
+                    args
+                )
+                with self._lock:
+                    for stored in cursor.fetchall():
+                        filters[(stored['postid'], stored['day'])].merge(stored['bits'])
+                    args.update({f'bits{i}': bytes(filters[key].bits)
+                                 for i, key in enumerate(keys)})
+
+                values = ', '.join(f"(%(postid{i})s, %(day{i})s, %(bits{i})s)"
+                                   for i in range(len(keys)))
+                cursor.execute(
+                    "INSERT INTO post_view_filters (postid, day, bits) "
+                    f"VALUES {values} "
+                    "ON DUPLICATE KEY UPDATE bits = VALUES(bits)",
+                    args
+                )
+
+            cursor.execute(
+                "DELETE FROM post_view_filters WHERE day < %(oldest)s",
+                {
+                    'oldest': today - datetime.timedelta(days=self.retention_days)
+                }
+            )
+
+        with self._lock:
+            for key in filters:
+                if key[1] < today:
+                    self._filters.pop(key, None)
+            self._stats['snapshots'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['filters'] = len(self._filters)
+            stats['dirtyFilters'] = len(self._dirty)
+        stats['repeatRatio'] = stats['repeats'] / (stats['views'] or 1)
+        return stats
+
+read_counts = ReadCountBuffer(server.application.config['READCOUNT_MAX_PENDING'])
+
+@server.tasks.periodic(server.application.config['READCOUNT_FLUSH_INTERVAL'])
+def flush_read_counts():
+    read_counts.flush()
+
+unique_views = UniqueViews(
+    server.application.config['VIEW_FILTER_BITS'],
+    server.application.config['VIEW_FILTER_HASHES'],
+    server.application.config['VIEW_FILTER_RETENTION_DAYS'],
+)
+
+@server.tasks.periodic(server.application.config['VIEW_FILTER_SNAPSHOT_INTERVAL'])
+def snapshot_unique_views():
+    unique_views.snapshot()
@@ -0,0 +1,80 @@
+import flask
+import server
+from ..helpers import encode_cursor, decode_cursor
+
+# SEARCH API ------------------------------------------------------------
+# /api/v2/bulletin/search
+@server.application.route("/api/v2/posts/search/", methods=['GET'])
+def search_posts():
+    """
+    Posts matching ?q=, best match first, optionally within ?board=<type>.
+
+    Backed by the ngram FULLTEXT index on (title, plainText), so Korean
+    queries match without word boundaries. Paginate with ?after=<cursor>,
+    passing the "next" cursor of the previous response.
+    """
+    # Initialize flask request arguments
+    query = flask.request.args.get("q", default="", type=str).strip()
+    board_type = flask.request.args.get("board", default=None, type=str)
+    size = flask.request.args.get("size", default=10, type=int)
+    after = flask.request.args.get("after", default=None, type=str)
+
+    # Sanity check for appropriate flask request arguments
+    if len(query) < server.application.config['SEARCH_MIN_QUERY_LENGTH']:
+        return flask.jsonify({'error': 'search query too short'}), 400
+    if size != 10 and size != 20 and size != 30:
+        return flask.jsonify({'error': 'invalid pagination args'}), 400
+
+    args = {
+        'query': query,
+        'limit': size + 1
+    }
+    filters = ""
+    if board_type:
+        filters += "AND type = %(type)s "
+        args['type'] = board_type
+
+    # Seek past the last (score, postid) of the previous page
+    having = ""
+    if after is not None:
+        try:
+            args['afterScore'], args['afterPostid'] = decode_cursor(after, float, int)
+        except ValueError:
+            return flask.jsonify({'error': 'invalid pagination args'}), 400
+        having = (
+            "HAVING score < %(afterScore)s "
+            "OR (score = %(afterScore)s AND postid < %(afterPostid)s) "
+        )
+
+    cursor = server.model.Cursor()
+    cursor.execute(
+        "SELECT postid, type, title, fullname, readCount, isAnnouncement, created, "
+        "commentsCount, likesCount, "
+        "MATCH (title, plainText) AGAINST (%(query)s IN NATURAL LANGUAGE MODE) AS score "
+        "FROM posts "
+        "WHERE MATCH (title, plainText) AGAINST (%(query)s IN NATURAL LANGUAGE MODE) "
+        f"{filters}"
+        f"{having}"
+        "ORDER BY score DESC, postid DESC "
+        "LIMIT %(limit)s",
+        args
+    )
+    posts = cursor.fetchall()
+
+    # One extra row was fetched to tell whether another page follows
+    results = list(posts[:size])
+    next_cursor = None
+    if len(posts) > size:
+        last = results[-1]
+        next_cursor = encode_cursor(repr(last['score']), last['postid'])
+
+    # render context
+    context_url = flask.request.path
+    if flask.request.query_string:
+        context_url += f"?{flask.request.query_string.decode()}"
+    context = {
+        "results": results,
+        "next": next_cursor,
+        "url": context_url
+    }
+    return flask.jsonify(**context), 200
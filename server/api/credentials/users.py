@@ -1,6 +1,7 @@
 import flask
 import server
 from ..helpers import fetch_user_posts, fetch_user_comments, token_required
+from ..helpers import encode_cursor, decode_cursor
 
 # Users API ------------------------------------------------------------
 # /api/v2/credentials/users
@@ -87,6 +88,33 @@ def delete_user(email):
                   methods=['GET'])
 @token_required
 def get_user_posts(email):
+    """
+    The user's posts, newest first, ?size=<n> at a time.
+    Pass the "next" cursor of the previous response as ?after=<cursor>.
+    """
+    # Initialize flask request arguments
+    size = flask.request.args.get(
+        "size",
+        default=20,
+        type=int
+    )
+    after = flask.request.args.get(
+        "after",
+        default=None,
+        type=str
+    )
+
+    # Sanity check for appropriate flask request arguments
+    if size < 1 or size > 50:
+        return flask.jsonify({'error': 'invalid pagination args'}), 400
+
+    after_postid = None
+    if after is not None:
+        try:
+            after_postid, = decode_cursor(after, int)
+        except ValueError:
+            return flask.jsonify({'error': 'invalid pagination args'}), 400
+
     cursor = server.model.Cursor()
 
     # Fetch the user based on email
@@ -104,19 +132,43 @@ def get_user_posts(email):
     if not user:
         return flask.jsonify({'error': 'No User Found'}), 404
     
-    user_posts = fetch_user_posts(email)
+    user_posts, next_postid = fetch_user_posts(email, size, after_postid)
 
-    # Check if the user exists
-    if user_posts is None:
-        return flask.jsonify({'error': 'User posts not found'}), 404
-    
     # Return the user's posts
-    return flask.jsonify({'posts': user_posts}), 200
+    next_cursor = encode_cursor(next_postid) if next_postid is not None else None
+    return flask.jsonify({'posts': user_posts, 'next': next_cursor}), 200
 
 @server.application.route("/api/v2/users/<string:email>/comments/",
                   methods=['GET'])
 @token_required
 def get_user_comments(email):
+    """
+    The user's comments, newest first, ?size=<n> at a time.
+    Pass the "next" cursor of the previous response as ?after=<cursor>.
+    """
+    # Initialize flask request arguments
+    size = flask.request.args.get(
+        "size",
+        default=20,
+        type=int
+    )
+    after = flask.request.args.get(
+        "after",
+        default=None,
+        type=str
+    )
+
+    # Sanity check for appropriate flask request arguments
+    if size < 1 or size > 50:
+        return flask.jsonify({'error': 'invalid pagination args'}), 400
+
+    after_commentid = None
+    if after is not None:
+        try:
+            after_commentid, = decode_cursor(after, int)
+        except ValueError:
+            return flask.jsonify({'error': 'invalid pagination args'}), 400
+
     cursor = server.model.Cursor()
 
     # Fetch the user based on email
@@ -133,11 +185,8 @@ def get_user_comments(email):
     if not user:
         return flask.jsonify({'error': 'No User Found'}), 404
     
-    user_comments = fetch_user_comments(email)
+    user_comments, next_commentid = fetch_user_comments(email, size, after_commentid)
 
-    # Check if the user exists
-    if user_comments is None:
-        return flask.jsonify({'error': 'User comments not found'}), 404
-    
-    # Return the user's posts
-    return flask.jsonify({'comments': user_comments}), 200
\ No newline at end of file
+    # Return the user's comments
+    next_cursor = encode_cursor(next_commentid) if next_commentid is not None else None
+    return flask.jsonify({'comments': user_comments, 'next': next_cursor}), 200
\ No newline at end of file
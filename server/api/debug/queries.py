@@ -0,0 +1,25 @@
+import flask
+import server
+from ..helpers import debug_only
+
+# DEBUG APIS -----------------------------------------------------------
+# /api/v2/_debug
+@server.application.route("/api/v2/_debug/queries/", methods=['GET'])
+@debug_only
+def get_recent_queries():
+    '''
+    Per-request SQL statistics of the most recent requests, newest first.
+    Pass ?flagged=true to only list requests with repeated statements (N+1).
+    '''
+    flagged = flask.request.args.get("flagged", default="false", type=str)
+
+    requests = list(server.model.recent_queries)[::-1]
+    if flagged.lower() == "true":
+        requests = [request for request in requests if request['repeated']]
+
+    context = {
+        "threshold": server.application.config['QUERY_REPEAT_THRESHOLD'],
+        "results": requests,
+        "url": flask.request.path
+    }
+    return flask.jsonify(**context), 200
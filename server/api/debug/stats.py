@@ -0,0 +1,37 @@
+import flask
+import server
+from ..helpers import debug_only
+from ..bulletin.readcount import read_counts, unique_views
+from ..bulletin.cache import board_cache
+from ..bulletin.popular import popular_posts
+
+# DEBUG APIS -----------------------------------------------------------
+# /api/v2/_debug
+@server.application.route("/api/v2/_debug/pool/", methods=['GET'])
+@debug_only
+def get_pool_stats():
+    '''
+    Saturation and checkout wait times of the MySQL connection pool.
+    '''
+    return flask.jsonify(server.model.pool.stats()), 200
+
+@server.application.route("/api/v2/_debug/buffers/", methods=['GET'])
+@debug_only
+def get_buffer_stats():
+    '''
+    Views buffered in memory and flush history of the write-behind buffers.
+    '''
+    context = {
+        'readCounts': read_counts.stats(),
+        'uniqueViews': unique_views.stats(),
+        'popularPosts': popular_posts.stats()
+    }
+    return flask.jsonify(**context), 200
+
+@server.application.route("/api/v2/_debug/cache/", methods=['GET'])
+@debug_only
+def get_cache_stats():
+    '''
+    Hit, miss and eviction counts of the board listing cache.
+    '''
+    return flask.jsonify(board_cache.stats()), 200
@@ -3,7 +3,11 @@ import jwt
 import server
 import os
 import re
+import base64
+import binascii
+import zlib
 from functools import wraps
+from html import unescape
 from urllib.parse import unquote
 
 def token_required(func):
@@ -22,128 +26,439 @@ def token_required(func):
             return flask.jsonify({'error': 'Decode failed'}), 401
     return token_test
 
-def count_comments(cursor, post):
+def debug_only(func):
+    @wraps(func)
+    def debug_test(*args, **kwargs):
+        # diagnostics are only served where DEBUG_ENDPOINTS is switched on;
+        # behind the load balancer every peer address is the proxy's own
+        if not server.application.config['DEBUG_ENDPOINTS']:
+            return flask.jsonify({'error': 'Not found'}), 404
+        return func(*args, **kwargs)
+    return debug_test
+
+def viewer_key():
+    """Who is reading: ?email= when logged in, else client address and browser."""
+    # remote_addr is the client's own address once ProxyFix has applied
+    # X-Forwarded-For, not the proxy's loopback address
+    email = flask.request.args.get("email", type=str)
+    if email:
+        return email
+    return f"{flask.request.remote_addr}|{flask.request.user_agent.string}"
+
+def encode_cursor(*values):
+    """Pack the keyset position of the last row into an opaque cursor."""
+    raw = ':'.join(str(value) for value in values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, *types):
+    """
+    Unpack a cursor made by encode_cursor, converting each value with types.
+    Raises ValueError if the cursor was not made by encode_cursor.
+    """
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding).decode()
+    except (binascii.Error, UnicodeDecodeError) as error:
+        raise ValueError(f"invalid cursor {cursor!r}") from error
+
+    values = raw.split(':')
+    if len(values) != len(types):
+        raise ValueError(f"invalid cursor {cursor!r}")
+    return tuple(type_(value) for type_, value in zip(types, values))
+
+def not_modified(etag):
+    """304 response for a conditional GET whose ETag still matches."""
+    response = flask.Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def with_etag(response, etag):
+    # no-cache: clients may store the body but must revalidate it
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def in_clause(values, prefix='id'):
+    """
+    Build the placeholders and args of an IN (...) list, e.g.
+    in_clause([3, 4]) == ('%(id0)s, %(id1)s', {'id0': 3, 'id1': 4})
+    """
+    args = {f'{prefix}{i}': value for i, value in enumerate(values)}
+    placeholders = ', '.join(f'%({key})s' for key in args)
+    return placeholders, args
+
+def adjust_comments_count(cursor, postid, delta):
+    # runs in the same transaction as the comment insert / delete;
+    # bumping version changes the ETag of the post
     cursor.execute(
-        "SELECT COUNT(*) "
-        "FROM comments "
-        "WHERE postid = %(comment_postid)s",
+        "UPDATE posts SET commentsCount = commentsCount + %(delta)s, "
+        "version = version + 1 "
+        "WHERE postid = %(postid)s",
         {
-            'comment_postid': post["postid"]
+            'delta': delta,
+            'postid': postid
         }
     )
-    comments_count = cursor.fetchone()["COUNT(*)"]
-    post["commentsCount"] = comments_count
 
-def count_likes(cursor, target, item):
-    id = item['postid'] if target == 'post' else item['commentid']
-    
+def adjust_likes_count(cursor, target, id, delta):
+    # runs in the same transaction as the like insert / delete;
+    # bumping version changes the ETag of the post
+    bump_version = ', version = version + 1' if target == 'post' else ''
     cursor.execute(
         f'''
-        SELECT COUNT(*) FROM {target}likes WHERE {target}id = %(id)s
+        UPDATE {target}s SET likesCount = likesCount + %(delta)s{bump_version}
+        WHERE {target}id = %(id)s
         ''',
         {
+            'delta': delta,
             'id': id
         }
     )
-    likes_count = cursor.fetchone()['COUNT(*)']
-    item['likesCount'] = likes_count
 
-def fetch_user_posts(email):
-    cursor = server.model.Cursor()
-
-    # Fetch posts associated with the given email
+def adjust_post_count(cursor, board_type, delta):
+    # runs in the same transaction as the post insert / update / delete
     cursor.execute(
-        '''
-            SELECT postid, title, created, fullname, type, readCount, isAnnouncement 
-            FROM posts 
-            WHERE email = %(email)s AND anonymous = %(anonymous)s
-        ''',
+        "INSERT INTO board_counters (type, postCount) VALUES (%(type)s, %(delta)s) "
+        "ON DUPLICATE KEY UPDATE postCount = postCount + %(delta)s",
         {
-            'email': email,
-            'anonymous': False
+            'type': board_type,
+            'delta': delta
         }
     )
-    user_posts = cursor.fetchall()[::-1]
 
-    # Add commentsCount to each post
-    for post in user_posts:
-        count_comments(cursor, post)
+def rebuild_board_counters(cursor):
+    """Recount the posts of every board from the posts table."""
+    cursor.execute(
+        '''
+        INSERT INTO board_counters (type, postCount)
+        SELECT type, COUNT(*) FROM posts
+        WHERE isAnnouncement = 0
+        GROUP BY type
+        ON DUPLICATE KEY UPDATE postCount = VALUES(postCount)
+        ''',
+        {}
+    )
 
-    return user_posts
+    # boards whose last post is gone
+    cursor.execute(
+        '''
+        UPDATE board_counters SET postCount = 0
+        WHERE postCount <> 0 AND type NOT IN (
+            SELECT DISTINCT type FROM posts WHERE isAnnouncement = 0
+        )
+        ''',
+        {}
+    )
 
-def fetch_user_comments(email):
+# Denormalized counters: (table, column, key, source table, source key)
+COUNTERS = [
+    ('posts', 'commentsCount', 'postid', 'comments', 'postid'),
+    ('posts', 'likesCount', 'postid', 'postlikes', 'postid'),
+    ('comments', 'likesCount', 'commentid', 'commentlikes', 'commentid'),
+]
+
+def reconcile_counters(cursor):
+    """
+    Recompute every denormalized counter that drifted from its source rows.
+    Returns the number of rows fixed per counter.
+    """
+    fixed = {}
+    for table, column, key, source, source_key in COUNTERS:
+        cursor.execute(
+            f'''
+            UPDATE {table} t
+            LEFT JOIN (
+                SELECT {source_key}, COUNT(*) AS n FROM {source} GROUP BY {source_key}
+            ) s ON s.{source_key} = t.{key}
+            SET t.{column} = COALESCE(s.n, 0)
+            WHERE t.{column} <> COALESCE(s.n, 0)
+            ''',
+            {}
+        )
+        fixed[f'{table}.{column}'] = cursor.rowcount()
+    return fixed
+
+def fetch_user_posts(email, size, after_postid=None):
+    """
+    A page of the user's non-anonymous posts, newest first, starting below
+    after_postid. Returns (posts, postid to continue after or None).
+    """
     cursor = server.model.Cursor()
 
-    # Fetch comments associated with the given email
+    # Fetch one extra row to know whether another page follows
+    after_clause = "AND postid < %(after)s " if after_postid is not None else ""
     cursor.execute(
-        'SELECT * FROM comments WHERE email = %(email)s AND anonymous = %(anonymous)s',
+        "SELECT postid, title, created, fullname, type, readCount, isAnnouncement, "
+        "commentsCount, likesCount "
+        "FROM posts "
+        "WHERE email = %(email)s AND anonymous = %(anonymous)s "
+        + after_clause +
+        "ORDER BY postid DESC LIMIT %(limit)s",
         {
             'email': email,
-            'anonymous': False
+            'anonymous': False,
+            'after': after_postid,
+            'limit': size + 1
         }
     )
-    user_comments = cursor.fetchall()[::-1]
+    user_posts = cursor.fetchall()
+
+    next_postid = user_posts[size - 1]['postid'] if len(user_posts) > size else None
+    return user_posts[:size], next_postid
 
-    return user_comments
+def fetch_user_comments(email, size, after_commentid=None):
+    """
+    A page of the user's non-anonymous comments, newest first, starting below
+    after_commentid. Returns (comments, commentid to continue after or None).
+    """
+    cursor = server.model.Cursor()
 
-def delete_child_comments(comment, cursor):
-    # search for any child comments of this comment
+    # Fetch one extra row to know whether another page follows
+    after_clause = "AND commentid < %(after)s " if after_commentid is not None else ""
     cursor.execute(
-        "SELECT * FROM comments WHERE parentCommentid = %(parentCommentid)s",
+        "SELECT * FROM comments "
+        "WHERE email = %(email)s AND anonymous = %(anonymous)s "
+        + after_clause +
+        "ORDER BY commentid DESC LIMIT %(limit)s",
         {
-            'parentCommentid': comment['commentid']
+            'email': email,
+            'anonymous': False,
+            'after': after_commentid,
+            'limit': size + 1
         }
     )
-    childComments = cursor.fetchall()
+    user_comments = cursor.fetchall()
 
-    # recursively delete child comments
-    for childComment in childComments:
-        delete_child_comments(childComment, cursor)
+    next_commentid = user_comments[size - 1]['commentid'] if len(user_comments) > size else None
+    return user_comments[:size], next_commentid
 
-    # delete comment itself
+def delete_comment_subtree(cursor, comment):
+    """Delete a comment and all of its replies; returns the number deleted."""
+    # collect the whole reply tree in one pass, walking the
+    # (postid, isCommentOfComment, parentCommentid) index
     cursor.execute(
-        'DELETE FROM comments WHERE commentid = %(commentid)s',
+        '''
+        WITH RECURSIVE subtree AS (
+            SELECT commentid, postid FROM comments
+            WHERE commentid = %(commentid)s
+            UNION ALL
+            SELECT c.commentid, c.postid FROM comments c
+            JOIN subtree s
+            ON c.postid = s.postid
+            AND c.isCommentOfComment = TRUE
+            AND c.parentCommentid = s.commentid
+        )
+        SELECT commentid FROM subtree
+        ''',
         {
             'commentid': comment['commentid']
         }
     )
+    commentids = [row['commentid'] for row in cursor.fetchall()]
+    if not commentids:
+        return 0
 
-def get_child_comments(comment, cursor):
-    # Before adding child comments, count likes for each comment
-    count_likes(cursor, "comment", comment)
-
-    # Set fullname according to email of the commenter
+    # replies always have larger ids than their parents, so deleting in
+    # descending order never removes a parent before its children
+    placeholders, args = in_clause(commentids)
     cursor.execute(
-        "SELECT fullname FROM users WHERE email = %(email)s",
+        f"DELETE FROM comments WHERE commentid IN ({placeholders}) "
+        "ORDER BY commentid DESC",
+        args
+    )
+    return cursor.rowcount()
+
+def fetch_comment_tree(cursor, postid):
+    """
+    Return the comments of a post as a tree of depth-1 comments, each with
+    its replies nested in childComments and counted in repliesCount. One
+    query, assembled in O(n).
+    """
+    # likesCount is the denormalized counter on comments
+    cursor.execute(
+        "SELECT c.*, u.fullname "
+        "FROM comments c "
+        "LEFT JOIN users u ON u.email = c.email "
+        "WHERE c.postid = %(postid)s "
+        "ORDER BY c.commentid",
         {
-            'email': comment['email']
+            'postid': postid
         }
     )
-    fullname = cursor.fetchone()
-    comment['fullname'] = fullname['fullname']
+    comments = cursor.fetchall()
 
-    # check for base case (if child comments does not exist)
+    comments_by_id = {}
+    for comment in comments:
+        comment['childComments'] = []
+        comments_by_id[comment['commentid']] = comment
+
+    # attach every reply to its parent; replies of missing parents are dropped
+    tree = []
+    for comment in comments:
+        if not comment['isCommentOfComment']:
+            tree.append(comment)
+        elif comment['parentCommentid'] in comments_by_id:
+            comments_by_id[comment['parentCommentid']]['childComments'].append(comment)
+    for comment in comments:
+        comment['repliesCount'] = len(comment['childComments'])
+    return tree
+
+def fetch_comment(cursor, commentid):
+    """
+    The stored comment with its author's fullname and its depth in the
+    tree (1 for comments on the post itself), or None if it is gone.
+    """
+    # walk up the parents; the depth is the length of that path
+    cursor.execute(
+        '''
+        WITH RECURSIVE ancestors AS (
+            SELECT commentid, isCommentOfComment, parentCommentid, 1 AS depth
+            FROM comments
+            WHERE commentid = %(commentid)s
+            UNION ALL
+            SELECT p.commentid, p.isCommentOfComment, p.parentCommentid, a.depth + 1
+            FROM comments p
+            JOIN ancestors a
+            ON a.isCommentOfComment = TRUE AND p.commentid = a.parentCommentid
+        )
+        SELECT c.*, u.fullname, (SELECT MAX(depth) FROM ancestors) AS depth
+        FROM comments c
+        LEFT JOIN users u ON u.email = c.email
+        WHERE c.commentid = %(commentid)s
+        ''',
+        {
+            'commentid': commentid
+        }
+    )
+    return cursor.fetchone()
+
+# Direct replies of comment c, counted on idx_comments_post_reply_parent
+REPLIES_COUNT = (
+    "(SELECT COUNT(*) FROM comments r "
+    "WHERE r.postid = c.postid AND r.isCommentOfComment = TRUE "
+    "AND r.parentCommentid = c.commentid) AS repliesCount"
+)
+
+def fetch_comment_page(cursor, postid, size, after_commentid=None, preview=3):
+    """
+    A page of the depth-1 comments of a post, oldest first, each with its
+    repliesCount and its first preview replies in childComments. Previewed
+    replies have their own repliesCount and an empty childComments, to be
+    loaded with fetch_replies.
+    Returns (comments, commentid to continue after or None).
+    """
+    # Fetch one extra row to know whether another page follows
+    after_clause = "AND c.commentid > %(after)s " if after_commentid is not None else ""
     cursor.execute(
-        "SELECT * FROM comments WHERE postid = %(postid)s "
-        "AND isCommentOfComment = %(isCommentOfComment)s "
-        "AND parentCommentid = %(parentCommentid)s",
+        "SELECT c.*, u.fullname "
+        "FROM comments c "
+        "LEFT JOIN users u ON u.email = c.email "
+        "WHERE c.postid = %(postid)s AND c.isCommentOfComment = FALSE "
+        + after_clause +
+        "ORDER BY c.commentid LIMIT %(limit)s",
         {
-            'postid': comment['postid'],
-            'isCommentOfComment': True,
-            'parentCommentid': comment['commentid']
+            'postid': postid,
+            'after': after_commentid,
+            'limit': size + 1
         }
     )
-    child_comments = cursor.fetchall()
+    comments = cursor.fetchall()
+    next_commentid = comments[size - 1]['commentid'] if len(comments) > size else None
+    comments = comments[:size]
 
-    # base case
-    if not child_comments:
+    comments_by_id = {}
+    for comment in comments:
         comment['childComments'] = []
-    
-    # recursive case
-    else:
-        comment['childComments'] = [dict(child_comment) for child_comment in child_comments]
-        for child_comment in comment['childComments']:
-            get_child_comments(child_comment, cursor)
+        comment['repliesCount'] = 0
+        comments_by_id[comment['commentid']] = comment
+    if not comments:
+        return comments, next_commentid
+
+    # Reply counts and the first replies of every comment in the page,
+    # ranked per parent in one query
+    placeholders, args = in_clause(list(comments_by_id), prefix='parent')
+    cursor.execute(
+        "SELECT * FROM ("
+        f"SELECT c.*, u.fullname, {REPLIES_COUNT}, "
+        "ROW_NUMBER() OVER (PARTITION BY c.parentCommentid ORDER BY c.commentid) AS replyNumber, "
+        "COUNT(*) OVER (PARTITION BY c.parentCommentid) AS siblingsCount "
+        "FROM comments c "
+        "LEFT JOIN users u ON u.email = c.email "
+        "WHERE c.postid = %(postid)s AND c.isCommentOfComment = TRUE "
+        f"AND c.parentCommentid IN ({placeholders})"
+        ") replies "
+        "WHERE replyNumber <= %(preview)s "
+        "ORDER BY commentid",
+        {
+            'postid': postid,
+            'preview': preview,
+            **args
+        }
+    )
+    for reply in cursor.fetchall():
+        parent = comments_by_id[reply['parentCommentid']]
+        parent['repliesCount'] = reply.pop('siblingsCount')
+        del reply['replyNumber']
+        reply['childComments'] = []
+        parent['childComments'].append(reply)
+    return comments, next_commentid
+
+def fetch_replies(cursor, postid, parentid, size, after_commentid=None):
+    """
+    A page of the direct replies to comment parentid, oldest first, each
+    with its repliesCount and an empty childComments.
+    Returns (replies, commentid to continue after or None).
+    """
+    # Fetch one extra row to know whether another page follows
+    after_clause = "AND c.commentid > %(after)s " if after_commentid is not None else ""
+    cursor.execute(
+        f"SELECT c.*, u.fullname, {REPLIES_COUNT} "
+        "FROM comments c "
+        "LEFT JOIN users u ON u.email = c.email "
+        "WHERE c.postid = %(postid)s AND c.isCommentOfComment = TRUE "
+        "AND c.parentCommentid = %(parentid)s "
+        + after_clause +
+        "ORDER BY c.commentid LIMIT %(limit)s",
+        {
+            'postid': postid,
+            'parentid': parentid,
+            'after': after_commentid,
+            'limit': size + 1
+        }
+    )
+    replies = cursor.fetchall()
+    next_commentid = replies[size - 1]['commentid'] if len(replies) > size else None
+    replies = replies[:size]
+    for reply in replies:
+        reply['childComments'] = []
+    return replies, next_commentid
+
+def fetch_liked(cursor, email, postids=(), commentids=()):
+    """
+    Which of postids and commentids email liked, as
+    {'posts': set of postids, 'comments': set of commentids}; one query.
+    """
+    liked = {'posts': set(), 'comments': set()}
+    if not email or not (postids or commentids):
+        return liked
+
+    selects = []
+    args = {'email': email}
+    for target, ids in (('post', postids), ('comment', commentids)):
+        if not ids:
+            continue
+        placeholders, id_args = in_clause(ids, prefix=target)
+        selects.append(
+            f"SELECT '{target}' AS target, {target}id AS id FROM {target}likes "
+            f"WHERE email = %(email)s AND {target}id IN ({placeholders})"
+        )
+        args.update(id_args)
+
+    cursor.execute(" UNION ALL ".join(selects), args)
+    for like in cursor.fetchall():
+        liked[like['target'] + 's'].add(like['id'])
+    return liked
 
 def check_orderItems_and_delete(cursor, existing_orderID):
     # check if orderItems are left for existing order
@@ -171,6 +486,170 @@ def check_orderItems_and_delete(cursor, existing_orderID):
             }
         )
 
+# posts.textCodec: how posts.text is stored
+TEXT_CODEC_PLAIN = 0  # UTF-8
+TEXT_CODEC_ZLIB = 1  # zlib-compressed UTF-8
+
+def encode_post_text(text):
+    """Return (stored bytes, textCodec) of a post body."""
+    raw = text.encode('utf-8')
+    if len(raw) >= server.application.config['POST_TEXT_COMPRESS_MIN']:
+        compressed = zlib.compress(raw, server.application.config['POST_TEXT_COMPRESS_LEVEL'])
+        if len(compressed) < len(raw):
+            return compressed, TEXT_CODEC_ZLIB
+    return raw, TEXT_CODEC_PLAIN
+
+def decode_post_text(data, codec):
+    """Inverse of encode_post_text."""
+    if codec == TEXT_CODEC_ZLIB:
+        data = zlib.decompress(data)
+    elif codec != TEXT_CODEC_PLAIN:
+        raise ValueError(f"unknown post text codec {codec}")
+    return data.decode('utf-8') if isinstance(data, (bytes, bytearray)) else data
+
+# Columns of a post as served by the API; the body is decoded separately
+POST_COLUMNS = (
+    "postid, type, email, title, isAnnouncement, fullname, readCount, anonymous, "
+    "created, commentsCount, likesCount, version"
+)
+
+def fetch_post(cursor, postid):
+    """The post with its decoded text, or None if there is no such post."""
+    cursor.execute(
+        f"SELECT {POST_COLUMNS}, text, textCodec "
+        "FROM posts "
+        "WHERE postid = %(postid)s",
+        {
+            'postid': postid
+        }
+    )
+    post = cursor.fetchone()
+    if post:
+        post['text'] = decode_post_text(post['text'], post.pop('textCodec'))
+    return post
+
+def index_post_texts(cursor, after_postid, batch_size):
+    """
+    Recompute plainText with html_to_text for the next batch_size posts
+    after after_postid. Returns the last postid seen, or None when no post
+    is left.
+    """
+    cursor.execute(
+        "SELECT postid, text, textCodec FROM posts "
+        "WHERE postid > %(after)s "
+        "ORDER BY postid LIMIT %(limit)s",
+        {
+            'after': after_postid,
+            'limit': batch_size
+        }
+    )
+    posts = cursor.fetchall()
+    for post in posts:
+        cursor.execute(
+            "UPDATE posts SET plainText = %(plainText)s WHERE postid = %(postid)s",
+            {
+                'plainText': html_to_text(decode_post_text(post['text'], post['textCodec'])),
+                'postid': post['postid']
+            }
+        )
+    return posts[-1]['postid'] if posts else None
+
+def compress_post_texts(cursor, after_postid, batch_size):
+    """
+    Compress the bodies of the next batch_size posts after after_postid
+    still stored as plain text. Returns the last postid seen, or None when
+    no post is left.
+    """
+    cursor.execute(
+        "SELECT postid, text FROM posts "
+        "WHERE postid > %(after)s AND textCodec = %(codec)s "
+        "ORDER BY postid LIMIT %(limit)s",
+        {
+            'after': after_postid,
+            'codec': TEXT_CODEC_PLAIN,
+            'limit': batch_size
+        }
+    )
+    posts = cursor.fetchall()
+    for post in posts:
+        text, codec = encode_post_text(decode_post_text(post['text'], TEXT_CODEC_PLAIN))
+        if codec != TEXT_CODEC_PLAIN:
+            cursor.execute(
+                "UPDATE posts SET text = %(text)s, textCodec = %(codec)s "
+                "WHERE postid = %(postid)s AND textCodec = %(plain)s",
+                {
+                    'text': text,
+                    'codec': codec,
+                    'postid': post['postid'],
+                    'plain': TEXT_CODEC_PLAIN
+                }
+            )
+    return posts[-1]['postid'] if posts else None
+
+def legacy_post_images(cursor, postid, text):
+    """
+    Record in post_images the uploaded images found in text, the body of a
+    post written before the manifest. Returns the recorded images as rows
+    of imageIndex and imageKey.
+    """
+    keys = list(dict.fromkeys(extract_uploaded_keys(text)))
+    if not keys:
+        return []
+
+    # keep the index in the key (post_<postid>_<index>.<ext>) where there
+    # is one; other keys are numbered after the largest
+    indexes = {}
+    for key in keys:
+        match = re.search(rf"post_{postid}_(\d+)\.[^/]*$", key)
+        if match and int(match.group(1)) not in indexes.values():
+            indexes[key] = int(match.group(1))
+    next_index = max(indexes.values(), default=-1) + 1
+    for key in keys:
+        if key not in indexes:
+            indexes[key] = next_index
+            next_index += 1
+
+    args = {'postid': postid}
+    rows = []
+    for i, key in enumerate(keys):
+        args[f'index{i}'] = indexes[key]
+        args[f'key{i}'] = key
+        rows.append(f"(%(postid)s, %(index{i})s, %(key{i})s)")
+    # a concurrent edit of the same post may have recorded them already
+    cursor.execute(
+        "INSERT IGNORE INTO post_images (postid, imageIndex, imageKey) "
+        f"VALUES {', '.join(rows)}",
+        args
+    )
+    return [{'imageIndex': indexes[key], 'imageKey': key} for key in keys]
+
+def backfill_post_images(cursor, after_postid, batch_size):
+    """
+    Record in post_images the uploaded images found in the bodies of the
+    next batch_size posts after after_postid. Posts that already have
+    images in the manifest are skipped. Returns the last postid seen, or
+    None when no post is left.
+    """
+    cursor.execute(
+        "SELECT postid, text, textCodec FROM posts p "
+        "WHERE postid > %(after)s "
+        "AND NOT EXISTS (SELECT 1 FROM post_images i WHERE i.postid = p.postid) "
+        "ORDER BY postid LIMIT %(limit)s",
+        {
+            'after': after_postid,
+            'limit': batch_size
+        }
+    )
+    posts = cursor.fetchall()
+    for post in posts:
+        legacy_post_images(cursor, post['postid'],
+                           decode_post_text(post['text'], post['textCodec']))
+    return posts[-1]['postid'] if posts else None
+
+def html_to_text(text):
+    """Visible text of editor HTML, as indexed for search."""
+    return ' '.join(unescape(re.sub(r'<[^>]+>', ' ', text)).split())
+
 def extract_temp_keys(text):
     # Temporary images for the editor starts with s3 URL
     base_url = f"https://{os.getenv('S3_BUCKET_NAME')}.s3.amazonaws.com"
@@ -1,6 +1,7 @@
 import server
 import os
-from ..helpers import extract_temp_keys, extract_uploaded_keys, replace_temp_srcs
+from ..helpers import extract_temp_keys, extract_uploaded_keys, replace_temp_srcs, in_clause
+from ..helpers import decode_post_text, legacy_post_images
 
 def upload_imgs(text, postid):
     """
@@ -8,93 +9,138 @@ def upload_imgs(text, postid):
     """
     # Base url for images for display on editor is a s3 url
     temp_keys = extract_temp_keys(text)
-        
-    # Construct list of new scrs
-    new_urls = []
-    for i, temp_key in enumerate(temp_keys):
-        extension = temp_key.split(".")[-1]
-        directory = "test_images" if os.getenv("FLASK_ENV") == 'development' else "images"
-        new_urls.append(
-            f"{os.getenv('CLOUDFRONT_URL')}/{directory}/post_{postid}_{i}.{extension}"
-        )
-
-    # Initiate AWS clients
-    client = server.model.AWSClient()
 
-    # Locate s3 images with the keys and move them to '/images', with new keys
-    for temp_key, new_url in zip(temp_keys, new_urls):
-        # Construct new key
-        new_key = new_url.split(f"{os.getenv('CLOUDFRONT_URL')}/")[1]
+    # Move them to '/images' and record them in the manifest, from index 0
+    new_urls = move_temp_imgs(temp_keys, postid, 0)
 
-        client.move_object(temp_key, new_key)
-    
     # return modified text to upper scope
     return replace_temp_srcs(text, new_urls)
 
 
-def update_imgs(new_text, prev_text, postid):
+def update_imgs(new_text, postid):
     """
-    Handle image upload and deletion according to the new and previous text
+    Handle image upload and deletion according to the new text and the
+    images recorded for the post in post_images
     """
-    # Extract key information from the previous and new text
-    # existing_keys = set(extract_keys(prev_text))
-    print("prev_text:" , prev_text)
+    # Images the post has now, from the manifest
+    cursor = server.model.Cursor()
+    images = fetch_post_images(cursor, postid)
+    existing_keys = {image['imageKey'] for image in images}
 
-    existing_keys = set(extract_uploaded_keys(prev_text))
-
-    print("existing_keys:", existing_keys)
     remaining_keys = set(extract_uploaded_keys(new_text))
     keys_to_delete = list(existing_keys - remaining_keys)
     keys_to_move = extract_temp_keys(new_text)
-    no_image_prev_text = not bool(existing_keys)
-    no_image_new_text = not bool(remaining_keys)
 
-    # case 1. no image in the original post && no new image added
-    if(no_image_prev_text and no_image_new_text):
+    # case 1. no image removed && no new image added
+    if not keys_to_delete and not keys_to_move:
         return new_text
 
     # Delete the images that does not remain in the new text anymore
-    client = server.model.AWSClient()
     if keys_to_delete:
-        client.delete_uploaded_objects(keys_to_delete)
+        delete_manifest_imgs(cursor, postid, keys_to_delete)
 
-    # Find maximum index of the images in the previous text
-    max_index = max(int(key.split('/')[1].split('_')[2].split('.')[0]) for key in existing_keys)
-
-    # Index for new images starts from +1 the max index
-    new_img_index = max_index + 1
+    # Index for new images starts from +1 the max index of the images the
+    # post had before this edit. Keys of images deleted in an earlier edit
+    # can be reused; their CloudFront paths were invalidated on delete
+    new_img_index = max((image['imageIndex'] for image in images), default=-1) + 1
 
     # Move the temp images in the new text to the permanent folder
-    # Construct list of new scrs
-    new_urls = []
-    for i, key in enumerate(keys_to_move, start=new_img_index):
-        extension = key.split(".")[-1]
-        directory = "test_images" if os.getenv("FLASK_ENV") == 'development' else "images"
-        new_urls.append(
-            f"{os.getenv('CLOUDFRONT_URL')}/{directory}/post_{postid}_{i}.{extension}"
-        )
-
-    # Locate s3 images with the keys and move them to '/images', with new keys
-    for temp_key, new_url in zip(keys_to_move, new_urls):
-        # Construct new key
-        new_key = new_url.split(f"{os.getenv('CLOUDFRONT_URL')}/")[1]
-
-        # Move the image
-        client.move_object(temp_key, new_key)
+    new_urls = move_temp_imgs(keys_to_move, postid, new_img_index)
 
     # return modified text to upper scope
     return replace_temp_srcs(new_text, new_urls)
 
-def delete_imgs(text):
+def delete_imgs(postid):
     """
-    Delete image files that were uploaded to the s3 bucket
+    Delete image files that were uploaded to the s3 bucket for a post
     """
-    # Initiate AWS clients
-    client = server.model.AWSClient()
-
-    # Extract the keys of the images that were uploaded before
-    keys_to_delete = extract_uploaded_keys(text)
+    cursor = server.model.Cursor()
+    keys_to_delete = [image['imageKey'] for image in fetch_post_images(cursor, postid)]
 
     # Delete the images
     if keys_to_delete:
-        client.delete_uploaded_objects(keys_to_delete)
\ No newline at end of file
+        delete_manifest_imgs(cursor, postid, keys_to_delete)
+
+def fetch_post_images(cursor, postid):
+    """
+    Images of a post as rows of imageIndex and imageKey. A post written
+    before the manifest and not backfilled yet has no rows; its images are
+    read from the stored body and recorded on first use.
+    """
+    cursor.execute(
+        "SELECT imageIndex, imageKey FROM post_images WHERE postid = %(postid)s",
+        {
+            'postid': postid
+        }
+    )
+    images = cursor.fetchall()
+    if images:
+        return images
+
+    cursor.execute(
+        "SELECT text, textCodec FROM posts WHERE postid = %(postid)s",
+        {
+            'postid': postid
+        }
+    )
+    post = cursor.fetchone()
+    if not post:
+        return []
+    return legacy_post_images(cursor, postid, decode_post_text(post['text'], post['textCodec']))
+
+def move_temp_imgs(temp_keys, postid, start_index):
+    """
+    Move temporary images to their permanent keys, numbered from
+    start_index, and add them to the manifest. Returns their new urls.
+    """
+    if not temp_keys:
+        return []
+
+    # Construct list of new scrs
+    directory = "test_images" if os.getenv("FLASK_ENV") == 'development' else "images"
+    new_keys = []
+    for i, temp_key in enumerate(temp_keys, start=start_index):
+        extension = temp_key.split(".")[-1]
+        new_keys.append(f"{directory}/post_{postid}_{i}.{extension}")
+
+    # Locate s3 images with the keys and move them to '/images', with new keys
+    client = server.model.AWSClient()
+    for temp_key, new_key in zip(temp_keys, new_keys):
+        client.move_object(temp_key, new_key)
+
+    # Record the images in the manifest
+    cursor = server.model.Cursor()
+    args = {'postid': postid}
+    rows = []
+    for i, new_key in enumerate(new_keys):
+        args[f'index{i}'] = start_index + i
+        args[f'key{i}'] = new_key
+        rows.append(f"(%(postid)s, %(index{i})s, %(key{i})s)")
+    cursor.execute(
+        "INSERT INTO post_images (postid, imageIndex, imageKey) "
+        f"VALUES {', '.join(rows)}",
+        args
+    )
+
+    return [f"{os.getenv('CLOUDFRONT_URL')}/{new_key}" for new_key in new_keys]
+
+def delete_manifest_imgs(cursor, postid, keys):
+    """
+    Remove images from the manifest; the files are deleted from s3 once
+    the transaction commits, so a rolled back edit keeps its images.
+    """
+    placeholders, args = in_clause(keys, prefix='key')
+    args['postid'] = postid
+    cursor.execute(
+        "DELETE FROM post_images "
+        f"WHERE postid = %(postid)s AND imageKey IN ({placeholders})",
+        args
+    )
+    server.model.after_commit(lambda: delete_uploaded_objects(keys))
+
+def delete_uploaded_objects(keys):
+    # runs after commit: a failure leaves orphaned files, not a failed request
+    try:
+        server.model.AWSClient().delete_uploaded_objects(keys)
+    except Exception as error:
+        print(f"[LOG-IMAGES] deleting {keys} failed: {error}")
@@ -227,37 +227,8 @@ def put_order_item_status(orderItemID):
         }
     )
 
-    # 
-
-    # send notification (silent) when order status is changed
-    send_notification(
-        email=email,
-        subject="order-status-update",
-        silent=True,
-        data={
-            'event': 'order-status-update',
-            'orderItemID': orderItemID,
-            'status': new_status
-        }
-    )
-
-    # emit socket event to dashboard (web)
-    server.sio.emit(
-        f"status-change-{email}", 
-        {
-            'status': new_status,
-            'orderItemID': orderItemID
-        }
-    )
-    
-    # send push notification (alert) when order is ready
-    if new_status == 'ready':
-        send_notification(
-            email=email,
-            subject="Order Status Changed",
-            title="Your Order is Ready!",
-            body="Please pick up your order at the booth."
-        )
+    # notify the user and the dashboard once the new status is committed
+    server.model.after_commit(lambda: notify_status_change(email, orderItemID, new_status))
 
     return flask.jsonify({
         "orderItemID": orderItemID,
@@ -265,6 +236,41 @@ def put_order_item_status(orderItemID):
     }
     ), 200
 
+def notify_status_change(email, orderItemID, new_status):
+    # runs after commit: a failed notification must not fail the request
+    try:
+        # send notification (silent) when order status is changed
+        send_notification(
+            email=email,
+            subject="order-status-update",
+            silent=True,
+            data={
+                'event': 'order-status-update',
+                'orderItemID': orderItemID,
+                'status': new_status
+            }
+        )
+
+        # emit socket event to dashboard (web)
+        server.sio.emit(
+            f"status-change-{email}", 
+            {
+                'status': new_status,
+                'orderItemID': orderItemID
+            }
+        )
+
+        # send push notification (alert) when order is ready
+        if new_status == 'ready':
+            send_notification(
+                email=email,
+                subject="Order Status Changed",
+                title="Your Order is Ready!",
+                body="Please pick up your order at the booth."
+            )
+    except Exception as e:
+        print(f"Error notifying status change of order item {orderItemID}: {e}")
+
 @server.application.route('/api/v2/pocha/dashboard/change-stock/', methods=['PUT'])
 def put_menu_stock():
     '''
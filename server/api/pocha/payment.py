@@ -170,8 +170,10 @@ def pay_success_fail(email, pochaID):
             }
         )
 
-        # emit on event "order-created"
-        server.sio.emit('order-created', {"newOrderItems": to_checkout})
+        # emit on event "order-created" once the paid order is committed
+        server.model.after_commit(
+            lambda: server.sio.emit('order-created', {"newOrderItems": to_checkout})
+        )
 
         return flask.jsonify({"message": "success",}), 200
 
@@ -0,0 +1,86 @@
+"""KISAWEB maintenance commands, run with `flask --app server <command>`."""
+import sys
+import click
+import server
+import server.migrate
+import server.api.helpers
+
+@server.application.cli.command('migrate')
+@click.option('--check', is_flag=True,
+              help='Only verify that hot queries use their intended indexes.')
+def migrate(check):
+    """Apply pending migrations in queries/migrations, then check query plans."""
+    if not check:
+        applied = server.migrate.run_migrations()
+        for version in applied:
+            click.echo(f"applied {version}")
+        if not applied:
+            click.echo("schema is up to date")
+
+    failed = False
+    for name, index, used_index, ok in server.migrate.check_query_plans():
+        click.echo(f"{'ok' if ok else 'MISMATCH':>8}  {name}: "
+                   f"expected {index}, used {used_index}")
+        failed = failed or not ok
+    if failed:
+        sys.exit(1)
+
+@server.application.cli.command('reconcile-counters')
+def reconcile_counters():
+    """Recompute comment / like counters that drifted from their rows."""
+    with server.model.transaction():
+        fixed = server.api.helpers.reconcile_counters(server.model.Cursor())
+    for counter, rows in fixed.items():
+        click.echo(f"{counter}: {rows} rows fixed")
+
+@server.application.cli.command('rebuild-board-counters')
+def rebuild_board_counters():
+    """Recount the posts of every board into board_counters."""
+    with server.model.transaction():
+        server.api.helpers.rebuild_board_counters(server.model.Cursor())
+    click.echo("board counters rebuilt")
+
+@server.application.cli.command('index-post-texts')
+@click.option('--batch-size', default=500, show_default=True,
+              help='Posts indexed per transaction.')
+def index_post_texts(batch_size):
+    """Recompute the searchable plainText of every post."""
+    after_postid = 0
+    while True:
+        with server.model.transaction():
+            after_postid = server.api.helpers.index_post_texts(
+                server.model.Cursor(), after_postid, batch_size)
+        if after_postid is None:
+            break
+        click.echo(f"indexed posts up to {after_postid}")
+    click.echo("post texts indexed")
+
+@server.application.cli.command('compress-post-texts')
+@click.option('--batch-size', default=500, show_default=True,
+              help='Posts compressed per transaction.')
+def compress_post_texts(batch_size):
+    """Compress the bodies of posts written before compression at rest."""
+    after_postid = 0
+    while True:
+        with server.model.transaction():
+            after_postid = server.api.helpers.compress_post_texts(
+                server.model.Cursor(), after_postid, batch_size)
+        if after_postid is None:
+            break
+        click.echo(f"compressed posts up to {after_postid}")
+    click.echo("post texts compressed")
+
+@server.application.cli.command('backfill-post-images')
+@click.option('--batch-size', default=500, show_default=True,
+              help='Posts scanned per transaction.')
+def backfill_post_images(batch_size):
+    """Record the images of existing posts in the post_images manifest."""
+    after_postid = 0
+    while True:
+        with server.model.transaction():
+            after_postid = server.api.helpers.backfill_post_images(
+                server.model.Cursor(), after_postid, batch_size)
+        if after_postid is None:
+            break
+        click.echo(f"scanned posts up to {after_postid}")
+    click.echo("post images recorded")
@@ -23,6 +23,75 @@ CLOUDFRONT_URL = os.getenv("CLOUDFRONT_URL", "https://d1jb1ppquwym6d.cloudfront.
 MYSQL_HOST = os.getenv("MYSQL_HOST")
 MYSQL_USER = os.getenv("MYSQL_USER")
 MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
+MYSQL_PORT = int(os.getenv("MYSQL_PORT", 3306))
+MYSQL_CHARSET = 'utf8'
+MYSQL_CONNECT_TIMEOUT = 10
+
+# MySQL connection pool (see server.model.ConnectionPool)
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", 10))
+MYSQL_POOL_TIMEOUT = float(os.getenv("MYSQL_POOL_TIMEOUT", 5))  # seconds to wait for a free connection
+MYSQL_POOL_IDLE_TIMEOUT = float(os.getenv("MYSQL_POOL_IDLE_TIMEOUT", 300))  # seconds before an idle connection is closed
+MYSQL_POOL_PRE_PING = True
+
+# Query log: requests repeating one statement more often than this are flagged as N+1
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", 5))
+QUERY_LOG_SIZE = 200  # number of recent requests kept for /api/v2/_debug/queries/
+
+# Diagnostics: the /api/v2/_debug/ endpoints, the recent query log and the
+# X-Query-Stats / X-DB-Statements headers. They expose request paths (with
+# user emails) and SQL, so they stay off unless DEBUG_ENDPOINTS=1; never
+# enable this in production.
+DEBUG_ENDPOINTS = os.getenv("DEBUG_ENDPOINTS") == "1"
+
+# Background tasks (see server.tasks)
+TASKS_TICK = 1  # seconds between checks for due tasks
+
+# Post read counts are buffered in memory and written in batches
+READCOUNT_FLUSH_INTERVAL = int(os.getenv("READCOUNT_FLUSH_INTERVAL", 10))  # seconds
+READCOUNT_MAX_PENDING = 1000  # posts buffered before an early flush
+
+# Number of proxies in front of the app that append to X-Forwarded-For:
+# 1 for a single-instance environment (nginx), 2 behind the load balancer
+PROXY_FIX_X_FOR = int(os.getenv("PROXY_FIX_X_FOR", 1))
+
+# Repeat views of a post by the same reader on the same day are not counted.
+# Readers are kept in a Bloom filter per post and day; 8192 bits and 4 hashes
+# keep false positives under 1% up to ~700 distinct readers of a post a day.
+VIEW_FILTER_BITS = 8192
+VIEW_FILTER_HASHES = 4
+VIEW_FILTER_RETENTION_DAYS = 2
+VIEW_FILTER_SNAPSHOT_INTERVAL = 60  # seconds
+
+# Board listing cache, keyed by board version so every process sees writes
+BOARD_CACHE_SIZE = 1024  # entries
+BOARD_CACHE_TTL = int(os.getenv("BOARD_CACHE_TTL", 30))  # seconds
+
+# Home feed: at most this many posts per board
+FEED_MAX_PER_BOARD = 10
+
+# Paged comments: replies shown under each depth-1 comment
+COMMENT_REPLIES_PREVIEW = 3
+
+# Batch liked-state lookups: at most this many ids per request
+LIKES_BATCH_MAX = 500
+
+# Popular posts leaderboard. Events weigh half as much every half-life;
+# scores are stored relative to an epoch and grow 2x per half-life, so the
+# epoch is moved to now, and the scores rescaled, once it is older than
+# POPULAR_REBASE_AFTER. POPULAR_EPOCH is only the first epoch.
+POPULAR_WEIGHTS = {'view': 1, 'like': 5, 'comment': 10}
+POPULAR_HALF_LIFE = 2 * 24 * 3600  # seconds
+POPULAR_EPOCH = 1767225600  # 2026-01-01 UTC
+POPULAR_REBASE_AFTER = 30 * 24 * 3600  # seconds; scores grow 2^15 meanwhile
+POPULAR_SIZE = 200  # posts ranked in memory
+POPULAR_PERSIST_INTERVAL = 60  # seconds
+
+# Post bodies are zlib-compressed at rest from this many bytes of HTML
+POST_TEXT_COMPRESS_MIN = 512
+POST_TEXT_COMPRESS_LEVEL = 6
+
+# Post search; the ngram FULLTEXT parser indexes 2-character tokens
+SEARCH_MIN_QUERY_LENGTH = 2
 
 # Cloudinary Configurations
 CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME")
@@ -0,0 +1,148 @@
+"""KISAWEB schema migrations (versioned SQL files in queries/migrations)."""
+import os
+import server
+
+MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'queries',
+    'migrations'
+)
+
+# Hot queries and the index each of them is expected to use.
+# (name, table, index, sql, args)
+HOT_QUERIES = [
+    (
+        'cart by user', 'order', 'idx_order_email_pocha_paid',
+        "SELECT orderID FROM `order` "
+        "WHERE email = %(email)s AND parentPochaID = %(parentPochaID)s AND isPaid = %(isPaid)s",
+        {'email': '', 'parentPochaID': 0, 'isPaid': False}
+    ),
+    (
+        'dashboard orders', 'order', 'idx_order_pocha_paid',
+        "SELECT email, orderID FROM `order` "
+        "WHERE parentPochaID = %(parentPochaID)s AND isPaid = %(isPaid)s",
+        {'parentPochaID': 0, 'isPaid': True}
+    ),
+    (
+        'order items by status', 'orderItem', 'idx_orderitem_order_status',
+        "SELECT orderItemID, status, quantity, menuID FROM orderItem "
+        "WHERE parentOrderID = %(parentOrderID)s AND status = %(status)s",
+        {'parentOrderID': 0, 'status': 'closed'}
+    ),
+    (
+        'board listing', 'posts', 'idx_posts_type_announcement_postid',
+        "SELECT postid FROM posts "
+        "WHERE type = %(type)s AND isAnnouncement = %(isAnnouncement)s "
+        "ORDER BY postid DESC LIMIT 10",
+        {'type': 'community', 'isAnnouncement': 0}
+    ),
+    (
+        'posts of user', 'posts', 'idx_posts_email_anonymous_postid',
+        "SELECT postid FROM posts "
+        "WHERE email = %(email)s AND anonymous = %(anonymous)s "
+        "ORDER BY postid DESC LIMIT 10",
+        {'email': '', 'anonymous': False}
+    ),
+    (
+        'comments of user', 'comments', 'idx_comments_email_anonymous_commentid',
+        "SELECT commentid FROM comments "
+        "WHERE email = %(email)s AND anonymous = %(anonymous)s "
+        "ORDER BY commentid DESC LIMIT 10",
+        {'email': '', 'anonymous': False}
+    ),
+    (
+        'post search', 'posts', 'ft_posts_title_plaintext',
+        "SELECT postid FROM posts "
+        "WHERE MATCH (title, plainText) AGAINST (%(query)s IN NATURAL LANGUAGE MODE)",
+        {'query': '검색'}
+    ),
+    (
+        'popular posts', 'post_scores', 'idx_post_scores_score',
+        "SELECT postid, score FROM post_scores ORDER BY score DESC LIMIT %(limit)s",
+        {'limit': 200}
+    ),
+    (
+        'comments of post', 'comments', 'idx_comments_post_reply_parent',
+        "SELECT commentid FROM comments "
+        "WHERE postid = %(postid)s AND isCommentOfComment = %(isCommentOfComment)s",
+        {'postid': 0, 'isCommentOfComment': False}
+    ),
+    (
+        'post liked or not', 'postlikes', 'idx_postlikes_post_email',
+        "SELECT * FROM postlikes WHERE postid = %(id)s AND email = %(email)s",
+        {'id': 0, 'email': ''}
+    ),
+    (
+        'comment liked or not', 'commentlikes', 'idx_commentlikes_comment_email',
+        "SELECT * FROM commentlikes WHERE commentid = %(id)s AND email = %(email)s",
+        {'id': 0, 'email': ''}
+    ),
+]
+
+def split_statements(sql):
+    """Split a migration file into statements, dropping -- comments."""
+    lines = [line for line in sql.splitlines()
+             if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';')
+            if statement.strip()]
+
+def list_migrations():
+    """Return (version, path) of every migration file, oldest first."""
+    return [
+        (filename[:-len('.sql')], os.path.join(MIGRATIONS_DIR, filename))
+        for filename in sorted(os.listdir(MIGRATIONS_DIR))
+        if filename.endswith('.sql')
+    ]
+
+def applied_versions(cursor):
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version VARCHAR(64) PRIMARY KEY, "
+        "applied TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+        {}
+    )
+    cursor.execute("SELECT version FROM schema_migrations", {})
+    return {row['version'] for row in cursor.fetchall()}
+
+def run_migrations():
+    """
+    Apply every pending migration in version order; returns their versions.
+
+    MySQL commits DDL implicitly, so a file that fails halfway is not undone:
+    fix the file (statements already applied must be removed) and rerun.
+    """
+    applied = []
+    with server.model.transaction():
+        done = applied_versions(server.model.Cursor())
+
+    for version, path in list_migrations():
+        if version in done:
+            continue
+        with open(path, encoding='utf-8') as migration:
+            statements = split_statements(migration.read())
+
+        with server.model.transaction():
+            cursor = server.model.Cursor()
+            for statement in statements:
+                cursor.execute(statement, None)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version) VALUES (%(version)s)",
+                {'version': version}
+            )
+        applied.append(version)
+    return applied
+
+def check_query_plans():
+    """
+    EXPLAIN every hot query; returns (name, expected index, used index, ok).
+    """
+    results = []
+    with server.model.transaction(read_only=True):
+        cursor = server.model.Cursor()
+        for name, table, index, sql, args in HOT_QUERIES:
+            cursor.execute("EXPLAIN " + sql, args)
+            used = [row['key'] for row in cursor.fetchall()
+                    if row['table'] == table]
+            used_index = used[0] if used else None
+            results.append((name, index, used_index, used_index == index))
+    return results
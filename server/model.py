@@ -1,18 +1,404 @@
 """KISAWEB model (connection with mySQL database)."""
 import server
+import flask
+import MySQLdb
 import MySQLdb.cursors
 import boto3
 import os
 import datetime
 import json
+import re
+import contextlib
+import threading
+import time
+from collections import deque
 from botocore.config import Config
 
+class PoolTimeout(Exception):
+    """Raised when no connection frees up within the checkout timeout."""
+
+class ConnectionPool:
+    """
+    Bounded pool of MySQL connections shared by every request.
+
+    Connections are handed out LIFO so the hottest ones stay warm, pinged
+    before reuse, and closed once they sit idle for longer than idle_timeout.
+    """
+    def __init__(self, connect, max_size, timeout, idle_timeout, pre_ping=True):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.pre_ping = pre_ping
+
+        # idle connections as (connection, released_at), oldest on the left
+        self._idle = deque()
+        self._in_use = 0
+        self._condition = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'opened': 0,
+            'evicted': 0,
+            'reconnects': 0,
+            'waitTimeTotal': 0.0,
+            'waitTimeMax': 0.0,
+        }
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._condition:
+            self._evict_idle()
+
+            # block until a connection is returned or a slot frees up
+            waited = False
+            while not self._idle and self._in_use >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        f"no connection available within {self.timeout}s "
+                        f"({self.max_size} in use)"
+                    )
+                waited = True
+                self._condition.wait(remaining)
+
+            wait_time = time.monotonic() - started
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+            self._stats['waitTimeTotal'] += wait_time
+            self._stats['waitTimeMax'] = max(self._stats['waitTimeMax'], wait_time)
+
+            self._in_use += 1
+            connection = self._idle.pop()[0] if self._idle else None
+
+        # open / ping outside the lock so a slow server does not stall others
+        try:
+            if connection is None:
+                return self._open()
+            if self.pre_ping:
+                return self._ping(connection)
+            return connection
+        except Exception:
+            self.release(None)
+            raise
+
+    def release(self, connection, discard=False):
+        with self._condition:
+            self._in_use -= 1
+            if connection is not None:
+                if discard:
+                    self._close(connection)
+                else:
+                    self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats['maxSize'] = self.max_size
+            stats['inUse'] = self._in_use
+            stats['idle'] = len(self._idle)
+            stats['saturation'] = self._in_use / self.max_size
+        checkouts = stats['checkouts'] or 1
+        stats['waitTimeAvgMs'] = stats.pop('waitTimeTotal') / checkouts * 1000
+        stats['waitTimeMaxMs'] = stats.pop('waitTimeMax') * 1000
+        return stats
+
+    def _open(self):
+        connection = self._connect()
+        with self._condition:
+            self._stats['opened'] += 1
+        return connection
+
+    def _ping(self, connection):
+        try:
+            connection.ping()
+            return connection
+        except MySQLdb.Error:
+            # stale connection (server restart, wait_timeout); replace it
+            self._close(connection)
+            with self._condition:
+                self._stats['reconnects'] += 1
+            return self._open()
+
+    def _evict_idle(self):
+        # caller holds the lock
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            connection, _ = self._idle.popleft()
+            self._close(connection)
+            self._stats['evicted'] += 1
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except MySQLdb.Error:
+            pass
+
+def connect():
+    config = server.application.config
+    return MySQLdb.connect(
+        host=config['MYSQL_HOST'],
+        user=config['MYSQL_USER'],
+        passwd=config['MYSQL_PASSWORD'],
+        db=config['MYSQL_DB'],
+        port=config['MYSQL_PORT'],
+        charset=config['MYSQL_CHARSET'],
+        connect_timeout=config['MYSQL_CONNECT_TIMEOUT'],
+        autocommit=False,
+    )
+
+pool = ConnectionPool(
+    connect,
+    max_size=server.application.config['MYSQL_POOL_SIZE'],
+    timeout=server.application.config['MYSQL_POOL_TIMEOUT'],
+    idle_timeout=server.application.config['MYSQL_POOL_IDLE_TIMEOUT'],
+    pre_ping=server.application.config['MYSQL_POOL_PRE_PING'],
+)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+class UnitOfWork:
+    """
+    The transaction owned by one app context (request, CLI command or task).
+
+    Opened lazily by the first Cursor on a pooled connection, committed once
+    when the context finishes cleanly and rolled back when it raises.
+    GET requests run read-only so InnoDB can skip transaction bookkeeping.
+    """
+    def __init__(self, connection, read_only=False):
+        self.connection = connection
+        self.read_only = read_only
+        self.active = True
+        self.in_transaction = False
+        self.savepoints = 0
+        self.statements = 0
+        self.commits = 0
+        self.on_commit = []
+        # set when the request raised; its writes must never be committed
+        self.failed = False
+
+    def begin(self):
+        if self.in_transaction:
+            return
+        if self.read_only:
+            with self.connection.cursor() as cursor:
+                cursor.execute("START TRANSACTION READ ONLY")
+        self.in_transaction = True
+
+    def commit(self):
+        if self.in_transaction:
+            self.connection.commit()
+            self.commits += 1
+        self.in_transaction = False
+
+        callbacks, self.on_commit = self.on_commit, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        self.connection.rollback()
+        self.in_transaction = False
+        self.on_commit = []
+
+    def savepoint(self):
+        self.begin()
+        self.savepoints += 1
+        name = f"sp_{self.savepoints}"
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SAVEPOINT {name}")
+        return name
+
+    def release_savepoint(self, name):
+        if self.in_transaction:
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"RELEASE SAVEPOINT {name}")
+
+    def rollback_to_savepoint(self, name):
+        if self.in_transaction:
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+
+def get_unit_of_work(read_only=None):
+    # every Cursor of the same app context shares one unit of work
+    if 'unit_of_work' not in flask.g:
+        if read_only is None:
+            read_only = (flask.has_request_context()
+                         and flask.request.method in SAFE_METHODS)
+        flask.g.unit_of_work = UnitOfWork(pool.acquire(), read_only)
+    return flask.g.unit_of_work
+
+def after_commit(callback):
+    """Run callback once the current unit of work commits (never on rollback)."""
+    get_unit_of_work().on_commit.append(callback)
+
+@contextlib.contextmanager
+def transaction(read_only=False):
+    """
+    Group statements so they commit together, or not at all.
+
+    The outermost scope of an app context commits on exit and rolls back on
+    exception. Nested scopes (including any scope inside a request, which is
+    a unit of work of its own) map to savepoints, so a failing block only
+    undoes its own statements and the request still commits once.
+    """
+    unit = get_unit_of_work(read_only)
+
+    # a read-only unit may still be upgraded before its first statement
+    if unit.read_only and not read_only:
+        if unit.in_transaction:
+            raise RuntimeError("cannot write inside a read-only transaction")
+        unit.read_only = False
+
+    if not flask.has_request_context() and not unit.in_transaction:
+        try:
+            yield unit
+        except Exception:
+            unit.rollback()
+            raise
+        unit.commit()
+    else:
+        name = unit.savepoint()
+        try:
+            yield unit
+        except Exception:
+            unit.rollback_to_savepoint(name)
+            raise
+        unit.release_savepoint(name)
+
+@flask.got_request_exception.connect_via(server.application)
+def fail_unit_of_work(sender, exception, **extra):
+    # after_request still runs for the 500 response of a raising view
+    unit = flask.g.get('unit_of_work')
+    if unit is not None:
+        unit.failed = True
+
+@server.application.after_request
+def commit_unit_of_work(response):
+    unit = flask.g.get('unit_of_work')
+    if unit is not None:
+        # a failed commit raises here and turns the response into a 500
+        if not unit.failed:
+            unit.commit()
+        if server.application.config['DEBUG_ENDPOINTS']:
+            response.headers['X-DB-Statements'] = str(unit.statements)
+    return response
+
+@server.application.teardown_appcontext
+def release_connection(exception):
+    unit = flask.g.pop('unit_of_work', None)
+    if unit is None:
+        return
+    unit.active = False
+
+    # CLI commands and background tasks never pass through after_request
+    try:
+        if exception is None and not unit.failed:
+            unit.commit()
+        else:
+            unit.rollback()
+    except MySQLdb.Error:
+        # a connection in an unknown state never goes back to the pool
+        pool.release(unit.connection, discard=True)
+        raise
+    pool.release(unit.connection)
+
+def fingerprint(sql):
+    """Normalize a statement so repeats with different arguments match."""
+    sql = re.sub(r'%\(\w+\)s(\s*,\s*%\(\w+\)s)*', '?', sql)
+    sql = re.sub(r'\b\d+\b', '?', sql)
+    return ' '.join(sql.split())
+
+class QueryLog:
+    """Statements executed during one app context, grouped by fingerprint."""
+    def __init__(self):
+        self.queries = {}
+        self.count = 0
+        self.duration = 0.0
+
+    def record(self, sql, duration, rows):
+        entry = self.queries.setdefault(
+            fingerprint(sql), {'count': 0, 'duration': 0.0, 'rows': 0}
+        )
+        entry['count'] += 1
+        entry['duration'] += duration
+        entry['rows'] += max(rows, 0)
+        self.count += 1
+        self.duration += duration
+
+    def repeated(self, threshold):
+        # the same statement issued over and over is the signature of N+1
+        return [sql for sql, entry in self.queries.items()
+                if entry['count'] > threshold]
+
+    def summary(self, threshold):
+        return {
+            'count': self.count,
+            'durationMs': round(self.duration * 1000, 3),
+            'repeated': self.repeated(threshold),
+            'queries': [
+                {
+                    'sql': sql,
+                    'count': entry['count'],
+                    'durationMs': round(entry['duration'] * 1000, 3),
+                    'rows': entry['rows'],
+                }
+                for sql, entry in sorted(self.queries.items(),
+                                         key=lambda e: e[1]['duration'],
+                                         reverse=True)
+            ],
+        }
+
+# summaries of the most recent requests, served by /api/v2/_debug/queries/
+recent_queries = deque(maxlen=server.application.config['QUERY_LOG_SIZE'])
+
+def get_query_log():
+    if 'query_log' not in flask.g:
+        flask.g.query_log = QueryLog()
+    return flask.g.query_log
+
+@server.application.after_request
+def record_query_log(response):
+    log = flask.g.get('query_log')
+    if log is None:
+        return response
+
+    threshold = server.application.config['QUERY_REPEAT_THRESHOLD']
+    summary = log.summary(threshold)
+    summary['method'] = flask.request.method
+    summary['path'] = flask.request.full_path.rstrip('?')
+    summary['status'] = response.status_code
+
+    # request paths carry user emails: only kept and shown when debugging
+    if server.application.config['DEBUG_ENDPOINTS']:
+        recent_queries.append(summary)
+        response.headers['X-Query-Stats'] = (
+            f"count={summary['count']}; "
+            f"time={summary['durationMs']}ms; "
+            f"repeated={len(summary['repeated'])}"
+        )
+    for sql in summary['repeated']:
+        print(f"[LOG-N+1] {summary['method']} {summary['path']}: "
+              f"{log.queries[sql]['count']}x {sql}")
+    return response
+
 class Cursor:
     def __init__(self):
-        self.cursor = server.db.connection.cursor(MySQLdb.cursors.DictCursor)
+        self.unit = get_unit_of_work()
+        self.log = get_query_log()
+        self.cursor = self.unit.connection.cursor(MySQLdb.cursors.DictCursor)
     
     def execute(self, sql, argsdict):
+        self.unit.begin()
+        started = time.perf_counter()
         self.cursor.execute(sql, argsdict)
+        self.log.record(sql, time.perf_counter() - started, self.cursor.rowcount)
+        self.unit.statements += 1
 
     def fetchall(self):
         return self.cursor.fetchall()
@@ -27,11 +413,13 @@ class Cursor:
         return self.cursor.rowcount
     
     def rollback(self):
-        server.db.connection.rollback()
+        self.unit.rollback()
     
     def __del__(self):
-        server.db.connection.commit()
-        self.cursor.close()
+        # committing is up to the unit of work; once its connection is back
+        # in the pool it may belong to another request, so leave it alone
+        if self.unit.active:
+            self.cursor.close()
 
 class AWSClient:
     def __init__(self):
@@ -0,0 +1,65 @@
+"""KISAWEB periodic background tasks, run in every server process."""
+import atexit
+import threading
+import time
+import server
+
+# registered tasks: {'func', 'interval', 'due'}
+_tasks = []
+_stopping = threading.Event()
+_started = threading.Lock()
+_thread = None
+
+def periodic(interval):
+    """Register func to run every interval seconds and once more at exit."""
+    def register(func):
+        _tasks.append({
+            'func': func,
+            'interval': interval,
+            'due': time.monotonic() + interval,
+        })
+        return func
+    return register
+
+def trigger(func):
+    """Run the registered task func on the next tick instead of at its interval."""
+    for task in _tasks:
+        if task['func'] is func:
+            task['due'] = 0
+
+def run(func):
+    # each run gets its own app context, so its own unit of work
+    try:
+        with server.application.app_context():
+            func()
+    except Exception as error:
+        print(f"[LOG-TASK] {func.__name__} failed: {error}")
+
+def _loop():
+    while not _stopping.wait(server.application.config['TASKS_TICK']):
+        now = time.monotonic()
+        for task in _tasks:
+            if now >= task['due']:
+                task['due'] = now + task['interval']
+                run(task['func'])
+
+@server.application.before_request
+def start():
+    # started lazily so forked workers each get their own thread
+    global _thread
+    if _thread is not None:
+        return
+    with _started:
+        if _thread is None:
+            _thread = threading.Thread(target=_loop, name='kisaweb-tasks', daemon=True)
+            _thread.start()
+
+@atexit.register
+def shutdown():
+    # flush whatever the tasks buffered since their last run; processes that
+    # never served a request (CLI commands such as migrate) buffered nothing
+    _stopping.set()
+    if _thread is None:
+        return
+    for task in _tasks:
+        run(task['func'])
@@ -0,0 +1,238 @@
+import unittest
+from unittest import mock
+
+try:
+    import server.tasks
+    from server.api import helpers
+    from server.api.bulletin import cache, likes, popular, readcount
+except ImportError as error:
+    raise unittest.SkipTest(f"server dependencies are not installed: {error}")
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+class TestTTLCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patch = mock.patch.object(cache, 'time', self.clock)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.cache = cache.TTLCache(max_size=2, ttl=30)
+
+    def test_hit_until_expiry(self):
+        compute = mock.Mock(side_effect=['first', 'second'])
+        self.assertEqual(self.cache.get_or_compute('a', 'board', compute), 'first')
+        self.assertEqual(self.cache.get_or_compute('a', 'board', compute), 'first')
+
+        self.clock.now += 31
+        self.assertEqual(self.cache.get_or_compute('a', 'board', compute), 'second')
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['expirations']), (1, 2, 1))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.get_or_compute('a', 'board', lambda: 'a')
+        self.cache.get_or_compute('b', 'board', lambda: 'b')
+        # touch a, so b is the least recently used
+        self.cache.get_or_compute('a', 'board', lambda: 'unused')
+        self.cache.get_or_compute('c', 'board', lambda: 'c')
+
+        self.assertEqual(self.cache.get_or_compute('a', 'board', lambda: 'miss'), 'a')
+        self.assertEqual(self.cache.get_or_compute('b', 'board', lambda: 'miss'), 'miss')
+        self.assertEqual(self.cache.stats()['evictions'], 2)
+
+    def test_invalidate_drops_group_only(self):
+        self.cache.get_or_compute('a', 'community', lambda: 'a')
+        self.cache.get_or_compute('b', 'notice', lambda: 'b')
+        self.cache.invalidate('community')
+
+        self.assertEqual(self.cache.get_or_compute('a', 'community', lambda: 'new'), 'new')
+        self.assertEqual(self.cache.get_or_compute('b', 'notice', lambda: 'miss'), 'b')
+
+    def test_value_computed_across_invalidation_is_not_stored(self):
+        def compute():
+            # a write to the board lands while the listing is being read
+            self.cache.invalidate('community')
+            return 'stale'
+
+        self.assertEqual(self.cache.get_or_compute('a', 'community', compute), 'stale')
+        self.assertEqual(self.cache.get_or_compute('a', 'community', lambda: 'fresh'), 'fresh')
+
+class TestCursors(unittest.TestCase):
+    def test_round_trip(self):
+        cursor = helpers.encode_cursor(1.25, 42)
+        self.assertNotIn('=', cursor)
+        self.assertEqual(helpers.decode_cursor(cursor, float, int), (1.25, 42))
+
+    def test_rejects_foreign_cursors(self):
+        with self.assertRaises(ValueError):
+            helpers.decode_cursor('not base64!', int)
+        with self.assertRaises(ValueError):
+            helpers.decode_cursor(helpers.encode_cursor(1, 2), int)
+
+class RowsCursor:
+    """Stand-in for server.model.Cursor that answers every query with rows."""
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    def execute(self, sql, argsdict):
+        self.statements.append((sql, argsdict))
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return None
+
+class TestCommentTree(unittest.TestCase):
+    def comment(self, commentid, parent=None):
+        return {
+            'commentid': commentid,
+            'isCommentOfComment': parent is not None,
+            'parentCommentid': parent,
+        }
+
+    def test_nests_replies_at_any_depth(self):
+        rows = [
+            self.comment(1),
+            self.comment(2, parent=1),
+            self.comment(3, parent=2),
+            self.comment(4),
+            self.comment(5, parent=99),  # parent was deleted
+        ]
+        tree = helpers.fetch_comment_tree(RowsCursor(rows), postid=7)
+
+        self.assertEqual([comment['commentid'] for comment in tree], [1, 4])
+        reply = tree[0]['childComments'][0]
+        self.assertEqual(reply['commentid'], 2)
+        self.assertEqual([child['commentid'] for child in reply['childComments']], [3])
+        self.assertEqual(tree[1]['childComments'], [])
+
+class TestReadCountBuffer(unittest.TestCase):
+    def test_returns_pending_views(self):
+        buffer = readcount.ReadCountBuffer(max_pending=10)
+        self.assertEqual(buffer.add(1), 1)
+        self.assertEqual(buffer.add(1), 2)
+        self.assertEqual(buffer.pending(1), 2)
+        self.assertEqual(buffer.pending(2), 0)
+
+    def test_full_buffer_triggers_background_flush(self):
+        buffer = readcount.ReadCountBuffer(max_pending=2)
+        with mock.patch.object(server.tasks, 'trigger') as trigger:
+            buffer.add(1)
+            trigger.assert_not_called()
+            self.assertEqual(buffer.add(2), 1)
+        trigger.assert_called_once_with(readcount.flush_read_counts)
+        self.assertEqual(buffer.stats()['pendingViews'], 2)
+
+class TestBloomFilter(unittest.TestCase):
+    def test_add_reports_repeats(self):
+        bloom = readcount.BloomFilter(size=8192, hashes=4)
+        self.assertTrue(bloom.add('reader@umich.edu'))
+        self.assertFalse(bloom.add('reader@umich.edu'))
+        self.assertTrue(bloom.add('other@umich.edu'))
+
+    def test_merge_unions_filters(self):
+        ours = readcount.BloomFilter(size=8192, hashes=4)
+        theirs = readcount.BloomFilter(size=8192, hashes=4)
+        ours.add('a')
+        theirs.add('b')
+
+        ours.merge(bytes(theirs.bits))
+        self.assertFalse(ours.add('a'))
+        self.assertFalse(ours.add('b'))
+
+    def test_restores_from_snapshot(self):
+        bloom = readcount.BloomFilter(size=8192, hashes=4)
+        bloom.add('a')
+        restored = readcount.BloomFilter(8192, 4, bytes(bloom.bits))
+        self.assertFalse(restored.add('a'))
+
+class TestParseIds(unittest.TestCase):
+    def test_drops_blanks_and_duplicates(self):
+        self.assertEqual(likes.parse_ids("1,2,,3,2"), [1, 2, 3])
+        self.assertEqual(likes.parse_ids(" 4 , 5 "), [4, 5])
+        self.assertEqual(likes.parse_ids(""), [])
+
+    def test_rejects_non_integers(self):
+        with self.assertRaises(ValueError):
+            likes.parse_ids("1,two")
+
+class TestPopularPosts(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(now=0.0)
+        patch = mock.patch.object(popular, 'time', self.clock)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.popular = popular.PopularPosts(
+            {'view': 1, 'like': 5, 'comment': 10},
+            half_life=3600, epoch=0, rebase_after=10 * 3600, size=10
+        )
+        self.cursor = RowsCursor([])
+
+    def test_ranks_by_weighted_events(self):
+        self.popular.record_many({1: 3, 2: 1}, 'view')
+        self.popular.record(2, 'like')
+        self.assertEqual([postid for postid, _ in self.popular.top(self.cursor, 2)], [2, 1])
+
+        # an unlike takes its weight back
+        self.popular.record(2, 'like', -1)
+        self.assertEqual([postid for postid, _ in self.popular.top(self.cursor, 2)], [1, 2])
+
+    def test_scores_halve_every_half_life(self):
+        self.popular.record(1, 'comment')
+        self.assertAlmostEqual(self.popular.top(self.cursor, 1)[0][1], 10)
+
+        self.clock.now += 3600
+        self.assertAlmostEqual(self.popular.top(self.cursor, 1)[0][1], 5)
+
+        # a newer event outweighs an older one of the same kind
+        self.popular.record(2, 'comment')
+        self.assertEqual([postid for postid, _ in self.popular.top(self.cursor, 2)], [2, 1])
+
+    def test_old_epoch_does_not_overflow(self):
+        # thousands of half-lives after the epoch, 2^age overflows a double
+        self.clock.now = 10_000_000
+        self.popular.record(1, 'like')
+        self.assertAlmostEqual(self.popular.top(self.cursor, 1)[0][1], 5)
+        self.assertEqual(self.popular.epoch, self.clock.now)
+
+    def test_moving_the_epoch_keeps_decayed_scores(self):
+        self.clock.now = 100 * 3600
+        self.popular.record(1, 'comment')
+        self.popular.record(2, 'like')
+
+        # a rebase by any process moves this one to the stored epoch on load
+        self.popular.load(self.cursor, epoch=self.clock.now)
+        self.assertEqual(self.popular.epoch, self.clock.now)
+        self.assertEqual(
+            [(postid, round(score, 6)) for postid, score in self.popular.top(self.cursor, 2)],
+            [(1, 10), (2, 5)]
+        )
+
+class TestPostTextCodec(unittest.TestCase):
+    def test_short_text_is_stored_plain(self):
+        stored, codec = helpers.encode_post_text("<p>짧은 글</p>")
+        self.assertEqual(codec, helpers.TEXT_CODEC_PLAIN)
+        self.assertEqual(helpers.decode_post_text(stored, codec), "<p>짧은 글</p>")
+
+    def test_long_text_round_trips_compressed(self):
+        text = "<p>공지사항 notice</p>" * 200
+        stored, codec = helpers.encode_post_text(text)
+        self.assertEqual(codec, helpers.TEXT_CODEC_ZLIB)
+        self.assertLess(len(stored), len(text.encode('utf-8')))
+        self.assertEqual(helpers.decode_post_text(stored, codec), text)
+
+    def test_rejects_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            helpers.decode_post_text(b"text", 7)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+
+try:
+    import server.migrate
+except ImportError as error:
+    raise unittest.SkipTest(f"server dependencies are not installed: {error}")
+
+class TestSplitStatements(unittest.TestCase):
+    def test_splits_on_semicolons_and_drops_comments(self):
+        sql = (
+            "-- indexes for the board listing;\n"
+            "ALTER TABLE posts ADD INDEX idx_a (type);\n"
+            "\n"
+            "  -- indented comment\n"
+            "CREATE TABLE t (\n"
+            "    id INT PRIMARY KEY\n"
+            ");\n"
+        )
+        self.assertEqual(
+            server.migrate.split_statements(sql),
+            ["ALTER TABLE posts ADD INDEX idx_a (type)",
+             "CREATE TABLE t (\n    id INT PRIMARY KEY\n)"]
+        )
+
+    def test_every_migration_file_has_statements(self):
+        for version, path in server.migrate.list_migrations():
+            with open(path) as migration:
+                self.assertTrue(server.migrate.split_statements(migration.read()), version)
+
+if __name__ == '__main__':
+    unittest.main()
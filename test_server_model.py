@@ -0,0 +1,175 @@
+import unittest
+from unittest import mock
+
+try:
+    import server
+    import server.model
+    import server.tasks
+except ImportError as error:
+    raise unittest.SkipTest(f"server dependencies are not installed: {error}")
+
+# Fake MySQL connection that records the statements it sees
+class FakeCursor:
+    def __init__(self, log):
+        self.log = log
+        self.rowcount = 1
+        self.lastrowid = 1
+
+    def execute(self, sql, args=None):
+        self.log.append(sql.split()[0].upper())
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return None
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class FakeConnection:
+    def __init__(self, log):
+        self.log = log
+        self.closed = False
+
+    def cursor(self, cursorclass=None):
+        return FakeCursor(self.log)
+
+    def commit(self):
+        self.log.append('COMMIT')
+
+    def rollback(self):
+        self.log.append('ROLLBACK')
+
+    def ping(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+# Routes only used by these tests; registered before any request is handled
+@server.application.route("/_test/unit-of-work/<string:outcome>/", methods=['POST'])
+def unit_of_work_view(outcome):
+    cursor = server.model.Cursor()
+    cursor.execute("INSERT INTO posts (title) VALUES (%(title)s)", {'title': ''})
+    if outcome == 'raise':
+        raise KeyError('text')
+    return {'message': 'ok'}, 201
+
+class TestUnitOfWork(unittest.TestCase):
+    def setUp(self):
+        self.log = []
+        pool = server.model.ConnectionPool(
+            lambda: FakeConnection(self.log),
+            max_size=2, timeout=1, idle_timeout=60, pre_ping=False
+        )
+        patches = [
+            mock.patch.object(server.model, 'pool', pool),
+            # keep the background tasks, and their exit flush, off the database
+            mock.patch.object(server.tasks, '_thread', mock.Mock()),
+            # answer with a 500 like production instead of re-raising
+            mock.patch.dict(server.application.config, {'PROPAGATE_EXCEPTIONS': False}),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.client = server.application.test_client()
+
+    def test_commits_once_on_success(self):
+        response = self.client.post("/_test/unit-of-work/ok/")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.log, ['INSERT', 'COMMIT'])
+
+    def test_raising_view_rolls_back(self):
+        response = self.client.post("/_test/unit-of-work/raise/")
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(self.log, ['INSERT', 'ROLLBACK'])
+
+class TestQueryLog(unittest.TestCase):
+    def test_fingerprint_ignores_arguments(self):
+        self.assertEqual(
+            server.model.fingerprint(
+                "SELECT * FROM posts\n  WHERE postid IN (%(id0)s, %(id1)s, %(id2)s) LIMIT 10"
+            ),
+            "SELECT * FROM posts WHERE postid IN (?) LIMIT ?"
+        )
+        self.assertEqual(
+            server.model.fingerprint("SELECT * FROM posts WHERE postid = %(postid)s"),
+            server.model.fingerprint("SELECT * FROM posts WHERE postid = 42")
+        )
+
+    def test_repeated_flags_statements_over_threshold(self):
+        log = server.model.QueryLog()
+        for postid in range(4):
+            log.record(f"SELECT likesCount FROM posts WHERE postid = {postid}", 0.001, 1)
+        log.record("SELECT * FROM users WHERE email = %(email)s", 0.002, 1)
+
+        self.assertEqual(log.repeated(3), ["SELECT likesCount FROM posts WHERE postid = ?"])
+        self.assertEqual(log.repeated(4), [])
+        summary = log.summary(3)
+        self.assertEqual(summary['count'], 5)
+        self.assertEqual(summary['queries'][0]['count'], 4)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.log = []
+        self.clock = FakeClock()
+        patch = mock.patch.object(server.model, 'time', self.clock)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def make_pool(self, **kwargs):
+        options = {'max_size': 1, 'timeout': 0, 'idle_timeout': 60, 'pre_ping': False}
+        options.update(kwargs)
+        return server.model.ConnectionPool(lambda: FakeConnection(self.log), **options)
+
+    def test_reuses_released_connection(self):
+        pool = self.make_pool()
+        connection = pool.acquire()
+        pool.release(connection)
+        self.assertIs(pool.acquire(), connection)
+        self.assertEqual(pool.stats()['opened'], 1)
+
+    def test_times_out_when_exhausted(self):
+        pool = self.make_pool()
+        pool.acquire()
+        with self.assertRaises(server.model.PoolTimeout):
+            pool.acquire()
+        stats = pool.stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['inUse'], 1)
+
+    def test_evicts_idle_connections(self):
+        pool = self.make_pool(idle_timeout=60)
+        connection = pool.acquire()
+        pool.release(connection)
+
+        self.clock.now += 61
+        fresh = pool.acquire()
+        self.assertIsNot(fresh, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['evicted'], 1)
+
+    def test_discarded_connection_is_closed(self):
+        pool = self.make_pool()
+        connection = pool.acquire()
+        pool.release(connection, discard=True)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['idle'], 0)
+        self.assertEqual(pool.stats()['inUse'], 0)
+
+if __name__ == '__main__':
+    unittest.main()